@@ -0,0 +1,82 @@
+"""
+Cache de soluções do roteirizador.
+
+As soluções são indexadas por um hash canônico da instância (nós da malha viária,
+demandas, frota, parâmetros do solver e versão do grafo) e gravadas em disco, de modo
+que sejam compartilhadas entre o servidor e os processos de otimização. Quando o número
+de entradas passa do limite, as menos usadas recentemente são removidas.
+"""
+# Imports de bibliotecas padrão
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_CACHE_DIR = os.path.join(".cache", "solutions")
+_DEFAULT_MAX_ENTRIES = 256
+
+
+class SolutionCache:
+    def __init__(self, directory: str = _DEFAULT_CACHE_DIR, max_entries: int = _DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(**parts) -> str:
+        """
+        Calcula a chave canônica de uma instância: o SHA-256 do JSON com chaves ordenadas
+        das partes informadas (listas de nós, demandas, capacidades, perfil, etc.).
+        """
+        payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=float)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        """Retorna a solução armazenada para a chave, ou None se não houver."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                solution = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # marca como usada recentemente (LRU pela data de modificação)
+        # JSON só tem chaves texto: restaura os IDs de veículo inteiros
+        solution["routes"] = {int(v): r for v, r in solution["routes"].items()}
+        return solution
+
+    def put(self, key: str, solution: dict):
+        """Armazena a solução e remove as entradas mais antigas se o limite for excedido."""
+        os.makedirs(self.directory, exist_ok=True)
+        # Escrita atômica: outros processos nunca leem um arquivo pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(solution, f, default=float)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        logger.info(f"Cache de soluções: {len(entries) - self.max_entries} entradas removidas.")
+
+    def clear(self):
+        """Remove todas as soluções armazenadas."""
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                os.remove(entry.path)
+
+
+# Cache compartilhado pelo servidor e pelos processos de otimização
+solution_cache = SolutionCache()
@@ -2,29 +2,352 @@
 Controlador do módulo 'depots': gerencia operações de CRUD e integração com OSMNX.
 """
 # Imports de bibliotecas padrão
+import argparse
 import logging
-from datetime import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 
 # Imports de bibliotecas padrão
 # Imports de terceiros
+import numpy as np
 from osmnx import geocode
 
 # Imports do projeto
 from backend.model import (
-    Session, Depots, Costumers, Vehicles,
+    engine, Session, Depots, Costumers, Vehicles,
     Orders, Planning, OrderStatus, PlanningStatus,
-    Routes
+    Routes, OptimizationRuns
 )
 
 from backend.graph import graph
-from backend.router import solve_vrp
+from backend.router import (
+    solve_vrp_decomposed, solve_vrp_portfolio, insert_unrouted,
+    check_feasibility, unreachable_nodes, SOLVER_PROFILES, DROP_PENALTY, DEFAULT_COST_PER_KM
+)
+from backend.heuristic import solve_savings, routes_from_solution
+from backend.cache import solution_cache
+from backend.sandbox import solve_vrp_isolated, DEADLINE_MARGIN
 
+from sqlalchemy import select, insert, update, delete, func, case
 from sqlalchemy.orm import joinedload
 
 # Configuração básica de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Acima deste número de pedidos, a otimização usa decomposição por clusters, com uma matriz de
+# distâncias exata por cluster e uma matriz esparsa completa (ver `_use_decomposition`)
+DECOMPOSITION_THRESHOLD = 300
+# Vizinhos calculados por pedido na matriz esparsa da busca local entre clusters
+DECOMPOSITION_NEIGHBORS = 20
+# Limites do subprocesso do solver: prazo rígido (s) para perfis sem time_limit e memória residente (MB)
+SOLVER_DEADLINE = 600
+SOLVER_MAX_RSS_MB = 4096
+# Tempo de atendimento de cada pedido (estacionar, entregar), em segundos
+SERVICE_TIME_SECONDS = 300
+# Número padrão de linhas por página nas listas paginadas
+PAGE_SIZE = 50
+
+# --- Projeções de leitura ---
+# As listas e mapas das páginas leem apenas as colunas que exibem, com selects do SQLAlchemy Core,
+# em dataclasses leves; as instâncias ORM completas ficam para os diálogos de edição.
+
+@dataclass(slots=True)
+class DepotRow:
+    id: int
+    name: str
+    address: str | None
+    latitude: float | None
+    longitude: float | None
+    active: bool
+
+@dataclass(slots=True)
+class CustomerRow:
+    id: int
+    name: str
+    email: str
+    address: str | None
+    latitude: float
+    longitude: float
+    active: bool
+
+@dataclass(slots=True)
+class VehicleRow:
+    id: int
+    model: str | None
+    plate: str
+    capacity: int
+    cost_per_km: float
+    active: bool
+    depot_id: int
+    depot_name: str | None
+
+@dataclass(slots=True)
+class OrderRow:
+    id: int
+    status: OrderStatus
+    demand: int
+    created_at: datetime | None
+    planning_id: int | None
+    customer_id: int
+    customer_name: str
+    latitude: float
+    longitude: float
+    customer_active: bool
+
+@dataclass(slots=True)
+class PlanningOrderRow:
+    id: int
+    planning_id: int
+    customer_name: str
+    demand: int
+    latitude: float
+    longitude: float
+
+@dataclass(slots=True)
+class PlanningSummary:
+    planning_id: int
+    order_count: int = 0
+    total_demand: int = 0
+    route_count: int = 0  # rotas com pelo menos um pedido
+    total_distance: float = 0.0
+    # Retângulo envolvente dos clientes dos pedidos (None sem pedidos)
+    min_latitude: float | None = None
+    min_longitude: float | None = None
+    max_latitude: float | None = None
+    max_longitude: float | None = None
+
+    @property
+    def bbox(self) -> list[list[float]] | None:
+        """Retângulo envolvente [[lat_min, lon_min], [lat_max, lon_max]], no formato do folium."""
+        if self.min_latitude is None:
+            return None
+        return [[self.min_latitude, self.min_longitude], [self.max_latitude, self.max_longitude]]
+
+@dataclass(slots=True)
+class PlanningRow:
+    id: int
+    status: PlanningStatus
+    deadline: datetime | None
+    created_at: datetime | None
+    depot_id: int
+    depot_name: str | None
+    depot_latitude: float | None
+    depot_longitude: float | None
+    orders: list[PlanningOrderRow] = field(default_factory=list)
+    summary: PlanningSummary | None = None
+
+def _rows(session, stmt, row_type) -> list:
+    """Executa o select e converte cada linha na dataclass `row_type` (colunas rotuladas como os campos)."""
+    return [row_type(**row._mapping) for row in session.execute(stmt)]
+
+def _keyset_page(session, stmt, id_column, row_type, limit: int, after: int | None) -> tuple[list, int | None]:
+    """
+    Pagina o select por chave (keyset), dos IDs mais recentes para os mais antigos:
+    retorna até `limit` linhas com ID menor que `after` e o token da próxima página
+    (o ID da última linha, ou None se não houver mais linhas).
+    """
+    if after is not None:
+        stmt = stmt.where(id_column < after)
+    # Uma linha a mais indica se há próxima página, sem contar o total
+    rows = _rows(session, stmt.order_by(id_column.desc()).limit(limit + 1), row_type)
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+def _order_status_filter(stmt, status_filter: str | None):
+    """Aplica o filtro de status de pedidos ('all' ou None não filtram)."""
+    if status_filter and status_filter != 'all':
+        try:
+            return stmt.where(Orders.status == OrderStatus[status_filter])
+        except KeyError:
+            logger.warning(f"Status de filtro inválido: '{status_filter}'")
+    return stmt
+
+def _planning_status_filter(stmt, status_filter: list[str] | None):
+    """Aplica o filtro por uma lista de status de planejamento."""
+    if status_filter:
+        try:
+            return stmt.where(Planning.status.in_([PlanningStatus[s] for s in status_filter]))
+        except KeyError as e:
+            logger.warning(f"Status de filtro inválido encontrado: {e}. O filtro de status será ignorado.")
+    return stmt
+
+def get_depot_rows(active_only: bool = False) -> list[DepotRow]:
+    """Projeção dos depósitos para a lista e o mapa de depósitos."""
+    stmt = select(Depots.id, Depots.name, Depots.address, Depots.latitude, Depots.longitude, Depots.active)
+    if active_only:
+        stmt = stmt.where(Depots.active == True)
+    with Session() as session:
+        return _rows(session, stmt.order_by(Depots.id), DepotRow)
+
+def get_customer_rows() -> list[CustomerRow]:
+    """Projeção dos clientes para a lista e o mapa de clientes."""
+    stmt = select(Costumers.id, Costumers.name, Costumers.email, Costumers.address,
+                  Costumers.latitude, Costumers.longitude, Costumers.active).order_by(Costumers.id)
+    with Session() as session:
+        return _rows(session, stmt, CustomerRow)
+
+def get_vehicle_rows() -> list[VehicleRow]:
+    """Projeção dos veículos, com o nome do depósito, para a lista de veículos."""
+    stmt = select(
+        Vehicles.id, Vehicles.model, Vehicles.plate, Vehicles.capacity,
+        func.coalesce(Vehicles.cost_per_km, DEFAULT_COST_PER_KM).label("cost_per_km"),
+        Vehicles.active, Vehicles.depot_id, Depots.name.label("depot_name")
+    ).outerjoin(Depots, Vehicles.depot_id == Depots.id).order_by(Vehicles.id)
+    with Session() as session:
+        return _rows(session, stmt, VehicleRow)
+
+def get_orders_page(status_filter: str | None = None, planning_id: int | None = None,
+                    customer_id: int | None = None, limit: int = PAGE_SIZE,
+                    after: int | None = None, unassigned: bool = False) -> tuple[list[OrderRow], int | None]:
+    """
+    Retorna uma página de pedidos (projeção com o cliente), dos mais recentes para os mais
+    antigos, e o token da próxima página (None na última), a ser passado em `after`.
+    - `status_filter`: Status dos pedidos (e.g., 'pending'); 'all' ou None retorna todos.
+    - `planning_id`, `customer_id`: Se informados, apenas pedidos desse planejamento/cliente.
+    - `unassigned`: Se True, apenas pedidos sem planejamento.
+    """
+    stmt = select(
+        Orders.id, Orders.status, Orders.demand, Orders.created_at, Orders.planning_id, Orders.customer_id,
+        Costumers.name.label("customer_name"), Costumers.latitude, Costumers.longitude,
+        Costumers.active.label("customer_active")
+    ).join(Costumers, Orders.customer_id == Costumers.id)
+    stmt = _order_status_filter(stmt, status_filter)
+    if planning_id is not None:
+        stmt = stmt.where(Orders.planning_id == planning_id)
+    if customer_id is not None:
+        stmt = stmt.where(Orders.customer_id == customer_id)
+    if unassigned:
+        stmt = stmt.where(Orders.planning_id.is_(None))
+    with Session() as session:
+        orders, next_after = _keyset_page(session, stmt, Orders.id, OrderRow, limit, after)
+    logger.info(f"{len(orders)} pedidos recuperados (filtro: {status_filter}, após id={after})")
+    return orders, next_after
+
+def get_planning_order_rows(planning_ids: list[int] | None = None) -> list[PlanningOrderRow]:
+    """
+    Projeção dos pedidos associados a planejamentos (cliente, demanda e coordenadas).
+    Se `planning_ids` for informado, apenas os pedidos desses planejamentos.
+    """
+    stmt = select(
+        Orders.id, Orders.planning_id, Costumers.name.label("customer_name"), Orders.demand,
+        Costumers.latitude, Costumers.longitude
+    ).join(Costumers, Orders.customer_id == Costumers.id).where(Orders.planning_id.is_not(None))
+    if planning_ids is not None:
+        stmt = stmt.where(Orders.planning_id.in_(planning_ids))
+    with Session() as session:
+        return _rows(session, stmt.order_by(Orders.planning_id, Orders.id), PlanningOrderRow)
+
+def _planning_rows_stmt():
+    """Select da projeção de planejamentos, com o depósito."""
+    return select(
+        Planning.id, Planning.status, Planning.deadline, Planning.created_at, Planning.depot_id,
+        Depots.name.label("depot_name"), Depots.latitude.label("depot_latitude"),
+        Depots.longitude.label("depot_longitude")
+    ).outerjoin(Depots, Planning.depot_id == Depots.id)
+
+def _attach_orders(plannings: list[PlanningRow]):
+    """Preenche `orders` de cada planejamento com uma única consulta."""
+    by_id = {p.id: p for p in plannings}
+    for order in get_planning_order_rows(list(by_id)) if by_id else []:
+        by_id[order.planning_id].orders.append(order)
+
+def get_planning_summaries(planning_ids: list[int] | None = None) -> dict[int, PlanningSummary]:
+    """
+    Agrega no banco (GROUP BY), por planejamento: número de pedidos, demanda total, número de
+    rotas com pedidos, distância total e retângulo envolvente dos clientes.
+    Se `planning_ids` for informado, apenas esses planejamentos (todos presentes no resultado).
+    """
+    orders_stmt = select(
+        Orders.planning_id, func.count(Orders.id).label("order_count"),
+        func.sum(Orders.demand).label("total_demand"),
+        func.min(Costumers.latitude).label("min_latitude"), func.min(Costumers.longitude).label("min_longitude"),
+        func.max(Costumers.latitude).label("max_latitude"), func.max(Costumers.longitude).label("max_longitude"),
+    ).join(Costumers, Orders.customer_id == Costumers.id).where(Orders.planning_id.is_not(None))
+    routes_stmt = select(
+        Routes.planning_id,
+        # Rotas com pelo menos um pedido (uma rota pode ter distância 0 e ainda assim atender pedidos)
+        func.sum(case((select(Orders.id).where(Orders.route_id == Routes.id).exists(), 1), else_=0))
+            .label("route_count"),
+        func.sum(Routes.distance).label("total_distance"),
+    )
+    if planning_ids is not None:
+        orders_stmt = orders_stmt.where(Orders.planning_id.in_(planning_ids))
+        routes_stmt = routes_stmt.where(Routes.planning_id.in_(planning_ids))
+    summaries = {pid: PlanningSummary(pid) for pid in planning_ids or []}
+    with Session() as session:
+        for row in session.execute(orders_stmt.group_by(Orders.planning_id)):
+            summary = summaries.setdefault(row.planning_id, PlanningSummary(row.planning_id))
+            summary.order_count, summary.total_demand = row.order_count, row.total_demand or 0
+            summary.min_latitude, summary.min_longitude = row.min_latitude, row.min_longitude
+            summary.max_latitude, summary.max_longitude = row.max_latitude, row.max_longitude
+        for row in session.execute(routes_stmt.group_by(Routes.planning_id)):
+            summary = summaries.setdefault(row.planning_id, PlanningSummary(row.planning_id))
+            summary.route_count, summary.total_distance = row.route_count or 0, row.total_distance or 0.0
+    return summaries
+
+def _attach_summaries(plannings: list[PlanningRow]):
+    """Preenche `summary` de cada planejamento (agregados calculados no banco)."""
+    summaries = get_planning_summaries([p.id for p in plannings]) if plannings else {}
+    for p in plannings:
+        p.summary = summaries[p.id]
+
+def get_plannings_page(status_filter: list[str] | None = None, depot_id: int | None = None,
+                       limit: int = PAGE_SIZE, after: int | None = None,
+                       with_orders: bool = False) -> tuple[list[PlanningRow], int | None]:
+    """
+    Retorna uma página de planejamentos (projeção com o depósito, o resumo agregado e, se
+    `with_orders`, os pedidos), dos mais recentes para os mais antigos, e o token da próxima
+    página (None na última), a ser passado em `after`.
+    - `status_filter`: Lista opcional de status (e.g., ['pending', 'optimizing']).
+    - `depot_id`: Se informado, apenas planejamentos desse depósito.
+    """
+    stmt = _planning_status_filter(_planning_rows_stmt(), status_filter)
+    if depot_id is not None:
+        stmt = stmt.where(Planning.depot_id == depot_id)
+    with Session() as session:
+        plannings, next_after = _keyset_page(session, stmt, Planning.id, PlanningRow, limit, after)
+    _attach_summaries(plannings)
+    if with_orders:
+        _attach_orders(plannings)
+    logger.info(f"{len(plannings)} planejamentos recuperados (filtro: {status_filter}, depósito: {depot_id}, "
+                f"após id={after})")
+    return plannings, next_after
+
+def get_planning_rows(status_filter: list[str] | None = None, with_orders: bool = False) -> list[PlanningRow]:
+    """
+    Projeção de todos os planejamentos (ex.: mapa), com o resumo agregado, dos mais recentes
+    para os mais antigos.
+    """
+    stmt = _planning_status_filter(_planning_rows_stmt(), status_filter).order_by(Planning.id.desc())
+    with Session() as session:
+        plannings = _rows(session, stmt, PlanningRow)
+    summaries = get_planning_summaries(None if status_filter is None else [p.id for p in plannings])
+    for p in plannings:
+        p.summary = summaries.get(p.id, PlanningSummary(p.id))
+    if with_orders:
+        _attach_orders(plannings)
+    return plannings
+
+def get_order_by_id(order_id: int):
+    """
+    Retorna um pedido pelo ID, com cliente e planejamento (e o depósito do planejamento),
+    para o diálogo de edição.
+    """
+    with Session() as session:
+        order = session.query(Orders).options(
+            joinedload(Orders.customer),
+            joinedload(Orders.planning).joinedload(Planning.depot)
+        ).filter(Orders.id == order_id).first()
+        if not order:
+            logger.warning(f"Pedido id={order_id} não encontrado")
+        return order
+
+
 def get_depots(active_only: bool = False):
     """
     Retorna a lista de todos os depósitos cadastrados no banco de dados.
@@ -466,73 +789,812 @@ def remove_order_from_planning(order_id: int) -> bool:
         return False
 
 
-def optimize_planning(planning_id: int) -> bool:
+def insert_orders_into_planning(planning_id: int, order_ids: list[int]) -> bool:
     """
-    Otimiza o planejamento, alterando seu status para 'optimizing'.
-    Retorna True se a otimização for iniciada com sucesso, False caso contrário.
+    Insere pedidos pendentes em um planejamento já roteirizado ('ready') sem re-otimizá-lo:
+    cada pedido entra na posição de menor custo de alguma rota existente cujo veículo
+    ainda tenha capacidade (inserção mais barata).
+    Cada pedido novo custa duas buscas na malha viária (uma a partir dele e uma reversa, até ele),
+    reaproveitadas para todos os trechos; os trechos atuais das rotas vêm de `leg_distance` e da
+    distância gravada de cada rota. O `sequence_position` dos pedidos das rotas é atualizado no lugar.
+    Retorna True se pelo menos um pedido for inserido, False caso contrário.
     """
     with Session() as session:
         planning = session.query(Planning).options(
-            joinedload(Planning.depot).joinedload(Depots.vehicles),
-            joinedload(Planning.orders).joinedload(Orders.customer)
+            joinedload(Planning.depot),
+            joinedload(Planning.routes).joinedload(Routes.vehicle),
+            joinedload(Planning.routes).joinedload(Routes.orders).joinedload(Orders.customer)
         ).filter(Planning.id == planning_id).first()
-        if planning and planning.status == PlanningStatus.pending:
+        if not planning or planning.status != PlanningStatus.ready or not planning.routes:
+            status_info = planning.status if planning else "não encontrado"
+            logger.warning(f"Planejamento id={planning_id} não tem rotas para inserção. Status atual: {status_info}.")
+            return False
+        new_orders = session.query(Orders).options(joinedload(Orders.customer)).filter(
+            Orders.id.in_(order_ids),
+            Orders.status == OrderStatus.pending,
+            Orders.planning_id.is_(None)
+        ).order_by(Orders.id).all()
+        if not new_orders:
+            logger.warning("Nenhum pedido elegível encontrado para inserção.")
+            return False
+
+        # Nós locais: 0 = depósito, depois as paradas atuais de cada rota e, por fim, os pedidos novos
+        routes = sorted(planning.routes, key=lambda r: r.id)
+        route_orders = [sorted(r.orders, key=lambda o: o.sequence_position) for r in routes]
+        stops = [o for orders in route_orders for o in orders]
+        coords = ([(planning.depot.latitude, planning.depot.longitude)]
+                  + [(o.customer.latitude, o.customer.longitude) for o in stops + new_orders])
+        nodes = graph.snap(coords)
+        n_old = 1 + len(stops)
+        new_idx = list(range(n_old, len(nodes)))
+        dist = np.full((len(nodes), len(nodes)), np.nan)
+        np.fill_diagonal(dist, 0.0)
+        # Linhas e colunas dos pedidos novos
+        dist[new_idx, :] = graph.node_distances([nodes[i] for i in new_idx], nodes)
+        dist[:, new_idx] = graph.node_distances([nodes[i] for i in new_idx], nodes, reverse=True).T
+        # Trechos atuais das rotas (necessários para o custo de inserção): cada pedido guarda a
+        # distância desde a parada anterior e a volta ao depósito é o restante da distância da rota
+        local_routes = []
+        position = 1
+        for route, orders in zip(routes, route_orders):
+            stops_idx = list(range(position, position + len(orders)))
+            local_routes.append(stops_idx)
+            position += len(orders)
+            if orders and all(o.leg_distance is not None for o in orders):
+                path = [0] + stops_idx
+                for a, b, order in zip(path, path[1:], orders):
+                    dist[a, b] = order.leg_distance
+                dist[stops_idx[-1], 0] = max(route.distance - sum(o.leg_distance for o in orders), 0.0)
+        # Rotas gravadas sem leg_distance: busca apenas os trechos desconhecidos
+        for route in local_routes:
+            path = [0] + route + [0]
+            for a, b in zip(path, path[1:]):
+                if np.isnan(dist[a, b]):
+                    dist[a, b] = graph.node_distances([nodes[a]], [nodes[b]])[0, 0]
+
+        demands = [0] + [o.demand for o in stops + new_orders]
+        capacities = [r.vehicle.capacity for r in routes]
+        local_routes, leftover = insert_unrouted(local_routes, new_idx, dist, demands, capacities)
+
+        local_orders = [None] + stops + new_orders
+        for route, stops_idx in zip(routes, local_routes):
+            path = [0] + stops_idx + [0]
+            route.distance = float(sum(dist[a, b] for a, b in zip(path, path[1:])))
+            route.load = float(sum(demands[i] for i in stops_idx))
+            for position, i in enumerate(stops_idx):
+                order = local_orders[i]
+                order.planning_id = planning_id
+                order.route_id = route.id
+                order.sequence_position = position
+                order.leg_distance = float(dist[path[position], i])
+                order.status = OrderStatus.processing
+        session.commit()
+        inserted = len(new_orders) - len(leftover)
+        if leftover:
+            logger.warning(f"{len(leftover)} pedidos não couberam em nenhuma rota do planejamento {planning_id}.")
+        logger.info(f"Inseridos {inserted} pedidos nas rotas do planejamento {planning_id}.")
+        return inserted > 0
+
+
+def _initial_routes_from_planning(planning, orders: list, vehicles: list) -> tuple[list[list[int]], list[int]]:
+    """
+    Monta as rotas iniciais do solver (warm start) a partir das `Routes` já gravadas
+    no planejamento e do `sequence_position` de cada pedido.
+    Os nós são índices na matriz de distâncias (pedido i ocupa o nó i + 1).
+    Retorna uma tupla (rotas por veículo, nós de pedidos ainda não roteados).
+    """
+    vehicle_index = {v.id: i for i, v in enumerate(vehicles)}
+    route_vehicle = {r.id: vehicle_index.get(r.vehicle_id) for r in planning.routes}
+    stops = [[] for _ in vehicles]
+    unrouted = []
+    for node, order in enumerate(orders, start=1):
+        vehicle_idx = route_vehicle.get(order.route_id)
+        if vehicle_idx is None or order.sequence_position is None:
+            unrouted.append(node)
+        else:
+            stops[vehicle_idx].append((order.sequence_position, node))
+    initial_routes = [[node for _, node in sorted(route)] for route in stops]
+    return initial_routes, unrouted
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Normaliza um datetime para UTC; valores sem fuso (como o SQLite os devolve) já estão em UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def start_optimization(planning_id: int) -> bool:
+    """
+    Marca o planejamento como 'optimizing', reservando-o para uma otimização.
+    Somente planejamentos 'pending' ou 'ready' (re-otimização) podem ser reservados.
+    Retorna True se o planejamento foi reservado, False caso contrário.
+    """
+    with Session() as session:
+        planning = session.query(Planning).filter(Planning.id == planning_id).first()
+        if planning and planning.status in [PlanningStatus.pending, PlanningStatus.ready]:
             planning.status = PlanningStatus.optimizing
             session.commit()
             logger.info(f"Planejamento id={planning_id} iniciado para otimização.")
-            router_input_data = {}
-            # coordenada do depósito
-            depot_coord = (planning.depot.latitude, planning.depot.longitude)
-            coords = [depot_coord] + [(order.customer.latitude, order.customer.longitude) for order in planning.orders]
-            dist_matrix = graph.distance_matrix(coords)
-            router_input_data["distance_matrix"] = dist_matrix
+            return True
+        status_info = planning.status if planning else "não encontrado"
+        logger.warning(f"Planejamento id={planning_id} não pode ser otimizado. Status atual: {status_info}.")
+        return False
+
+
+def _status_after_failure(planning) -> PlanningStatus:
+    """Status para o qual um planejamento em otimização volta se ela falhar ou for abortada."""
+    return PlanningStatus.ready if planning.routes else PlanningStatus.pending
+
+
+def release_planning(planning_id: int) -> bool:
+    """
+    Libera um planejamento em 'optimizing' sem gravar solução (ex.: otimização abortada),
+    voltando para 'ready' se ele já tinha rotas ou para 'pending' caso contrário.
+    Retorna True se o planejamento foi liberado, False caso contrário.
+    """
+    with Session() as session:
+        planning = session.query(Planning).options(joinedload(Planning.routes)) \
+            .filter(Planning.id == planning_id).first()
+        if planning and planning.status == PlanningStatus.optimizing:
+            planning.status = _status_after_failure(planning)
+            session.commit()
+            logger.info(f"Planejamento id={planning_id} liberado (status: {planning.status.value}).")
+            return True
+        return False
+
+
+def _use_decomposition(planning, orders: list, engine: str, use_time: bool, drop_unserved: bool) -> bool:
+    """
+    Indica se o planejamento será resolvido por decomposição por clusters: apenas planejamentos
+    grandes (acima de DECOMPOSITION_THRESHOLD pedidos), resolvidos do zero pelo OR-Tools, sem
+    prazo nem descarte de pedidos (que exigem o problema completo).
+    """
+    return (engine == "ortools" and not planning.routes and not use_time and not drop_unserved
+            and len(orders) > DECOMPOSITION_THRESHOLD)
+
+
+def _solve_planning(planning, orders: list, vehicles: list, router_input_data: dict, coords: list,
+                    portfolio: bool, engine: str, on_solution=None, should_stop=None,
+                    decompose: bool = False, matrix_builder=None) -> dict:
+    """
+    Escolhe o método de solução (warm start, heurística, decomposição, portfólio ou OR-Tools)
+    e resolve o problema descrito em `router_input_data`.
+    Com `decompose` (ver `_use_decomposition`), a matriz de `router_input_data` pode ser esparsa:
+    `matrix_builder` calcula então a matriz exata de cada cluster (ver `solve_vrp_decomposed`).
+    """
+    planning_id = planning.id
+    # Warm start: reaproveita as rotas atuais e insere os pedidos novos
+    if planning.routes and engine != "savings":
+        initial_routes, unrouted = _initial_routes_from_planning(planning, orders, vehicles)
+        initial_routes, leftover = insert_unrouted(
+            initial_routes, unrouted, router_input_data["distance_matrix"],
+            router_input_data["demands"], router_input_data["vehicle_capacities"]
+        )
+        if not leftover:
+            router_input_data["initial_routes"] = initial_routes
+            logger.info(f"Planejamento id={planning_id}: warm start a partir de {len(planning.routes)} rotas "
+                        f"({len(unrouted)} pedidos novos inseridos).")
+        else:
+            logger.info(f"Planejamento id={planning_id}: {len(leftover)} pedidos não couberam nas rotas atuais; "
+                        f"otimizando do zero.")
+    elif engine == "savings+ortools":
+        seed = solve_savings(router_input_data)
+        if "error" not in seed:
+            router_input_data["initial_routes"] = routes_from_solution(seed, len(vehicles))
+
+    if "drop_penalty" in router_input_data or "time_matrix" in router_input_data:
+        # Somente o OR-Tools sabe deixar pedidos de fora (disjunções) e respeitar prazos
+        logger.info(f"Planejamento id={planning_id}: resolvendo com o OR-Tools "
+                    f"(descarte de pedidos: {'drop_penalty' in router_input_data}, "
+                    f"prazo: {'route_time_limit' in router_input_data}).")
+        return _solve_isolated(router_input_data, on_solution, should_stop)
+    if engine == "savings":
+        return solve_savings(router_input_data)
+    if decompose:
+        logger.info(f"Planejamento id={planning_id}: {len(orders)} pedidos, usando decomposição por clusters.")
+        router_input_data["coordinates"] = coords
+        return solve_vrp_decomposed(router_input_data, on_solution=on_solution, should_stop=should_stop,
+                                    matrix_builder=matrix_builder)
+    if portfolio:
+        sol = solve_vrp_portfolio(router_input_data)
+        for run in sol["portfolio"]:
+            logger.info(f"Portfólio planejamento id={planning_id}: {run['first_solution_strategy']}/"
+                        f"{run['local_search_metaheuristic']} objetivo={run['objective']} "
+                        f"tempo={run['time']:.2f}s")
+        return sol
+    return _solve_isolated(router_input_data, on_solution, should_stop)
+
+
+def _solve_isolated(router_input_data: dict, on_solution=None, should_stop=None) -> dict:
+    """
+    Executa `solve_vrp` em um subprocesso isolado (ver `solve_vrp_isolated`), com prazo rígido
+    e limite de memória; se o subprocesso for encerrado, usa a melhor solução encontrada.
+    """
+    time_limit = router_input_data.get("time_limit")
+    deadline = time_limit + DEADLINE_MARGIN if time_limit else SOLVER_DEADLINE
+    return solve_vrp_isolated(router_input_data, deadline=deadline, max_rss_mb=SOLVER_MAX_RSS_MB,
+                              on_solution=on_solution, should_stop=should_stop)
+
+
+def _exact_route_distances(sol: dict, nodes: list[int], distance_matrix: np.ndarray, candidates: np.ndarray,
+                           vehicle_costs: list[float] | None = None):
+    """
+    Recalcula a distância das rotas da solução substituindo as distâncias estimadas dos arcos
+    fora da lista de candidatos (ver `Graph.node_sparse_distance_matrix`) pelas distâncias
+    reais na malha viária, com uma busca por nó de origem com arcos estimados.
+    Com `vehicle_costs`, o objetivo recalculado é o custo da frota (distância × custo por km).
+    """
+    estimated = {}  # origem -> destinos cujos arcos foram estimados
+    for route_info in sol["routes"].values():
+        for a, b in zip(route_info["route"], route_info["route"][1:]):
+            if not candidates[a, b]:
+                estimated.setdefault(a, set()).add(b)
+    if not estimated:
+        return
+    exact = {}
+    for a, targets in estimated.items():
+        targets = sorted(targets)
+        row = graph.node_distances([nodes[a]], [nodes[b] for b in targets])[0]
+        exact.update({(a, b): d for b, d in zip(targets, row)})
+    for route_info in sol["routes"].values():
+        route = route_info["route"]
+        route_info["legs"] = [float(exact.get((a, b), distance_matrix[a, b])) for a, b in zip(route, route[1:])]
+        route_info["distance"] = sum(route_info["legs"])
+    distances = [r["distance"] for r in sol["routes"].values()]
+    if vehicle_costs:
+        sol["objective"] = int(round(sum(r["distance"] * vehicle_costs[v] for v, r in sol["routes"].items())))
+    else:
+        sol["objective"] = int(round(sum(distances)))
+    sol["max_route_distance"] = max(distances, default=0)
+    logger.info(f"{len(exact)} arcos fora da lista de candidatos recalculados na malha viária.")
+
+
+def _save_routes(session, planning_ids: list[int], order_ids: list[int], routes: list[dict]):
+    """
+    Grava as rotas de uma solução em lote, na transação da sessão: insere as novas rotas com um
+    único INSERT ... RETURNING, atualiza todos os pedidos dos planejamentos com um único UPDATE
+    em lote por chave primária e remove as rotas anteriores. Pedidos fora das rotas voltam a
+    ficar pendentes e sem rota.
+
+    Args:
+        planning_ids: Planejamentos cujas rotas anteriores são substituídas.
+        order_ids: Todos os pedidos desses planejamentos.
+        routes: Colunas de cada nova rota (planning_id, vehicle_id, distance, load), acrescidas de
+            "orders": os IDs dos pedidos da rota, na ordem de visita, e "legs": a distância de cada
+            arco da rota, do depósito ao depósito (None se desconhecida), gravada em `leg_distance`.
+    """
+    route_ids = list(session.scalars(
+        insert(Routes).returning(Routes.id, sort_by_parameter_order=True),
+        [{k: v for k, v in route.items() if k not in ("orders", "legs")} for route in routes]
+    )) if routes else []
+    values = {order_id: {"id": order_id, "status": OrderStatus.pending, "route_id": None,
+                         "sequence_position": None, "leg_distance": None} for order_id in order_ids}
+    for route, route_id in zip(routes, route_ids):
+        legs = route.get("legs")
+        for position, order_id in enumerate(route["orders"]):
+            values[order_id] = {"id": order_id, "status": OrderStatus.processing, "route_id": route_id,
+                                "sequence_position": position, "planning_id": route["planning_id"],
+                                "leg_distance": float(legs[position]) if legs else None}
+    # O UPDATE em lote agrupa as linhas pelo conjunto de colunas: pedidos com e sem rota
+    rows = list(values.values())
+    for columns in ({"id", "status", "route_id", "sequence_position", "leg_distance"},
+                    {"id", "status", "route_id", "sequence_position", "leg_distance", "planning_id"}):
+        batch = [row for row in rows if row.keys() == columns]
+        if batch:
+            session.execute(update(Orders), batch)
+    session.execute(delete(Routes).where(Routes.planning_id.in_(planning_ids), Routes.id.not_in(route_ids)),
+                    execution_options={"synchronize_session": False})
+
+
+def _cost_per_km(vehicle) -> float:
+    """Custo por km do veículo, ou DEFAULT_COST_PER_KM se não cadastrado."""
+    return DEFAULT_COST_PER_KM if vehicle.cost_per_km is None else vehicle.cost_per_km
+
+
+def _fleet_cost(sol: dict, vehicles: list) -> float:
+    """
+    Custo da frota na solução: soma de distância (m) × custo por km de cada rota, em milésimos
+    da unidade monetária (a mesma escala do objetivo do OR-Tools, sem penalidades).
+    """
+    return float(sum(r["distance"] * _cost_per_km(vehicles[int(v)]) for v, r in sol["routes"].items()))
+
+
+def _record_run(planning_id: int, profile: str, engine: str, status: str, timings: dict,
+                num_orders: int = 0, num_vehicles: int = 0, objective: float | None = None):
+    """
+    Grava a telemetria de uma execução de `run_optimization` (tempo de cada etapa, tamanho
+    da instância, objetivo e status do solver) na tabela `optimization_runs`.
+    O objetivo gravado é o custo da frota (ver `_fleet_cost`), qualquer que seja o método de solução.
+    """
+    with Session() as session:
+        run = OptimizationRuns(
+            planning_id=planning_id, profile=profile, engine=engine, solver_status=status,
+            num_orders=num_orders, num_vehicles=num_vehicles, objective=objective,
+            snapping_time=timings.get("snapping", 0.0), matrix_time=timings.get("matrix", 0.0),
+            solver_time=timings.get("solver", 0.0), persistence_time=timings.get("persistence", 0.0),
+            total_time=timings.get("total", 0.0)
+        )
+        session.add(run)
+        session.commit()
+    logger.info(f"Otimização do planejamento id={planning_id}: status={status}, {num_orders} pedidos, "
+                f"{num_vehicles} veículos, objetivo={objective}, tempos(s)="
+                + ", ".join(f"{k}={v:.3f}" for k, v in timings.items()))
+
+
+def get_optimization_runs(planning_id: int | None = None, limit: int = 100):
+    """
+    Retorna a telemetria das execuções de otimização, das mais recentes para as mais antigas.
+    Se `planning_id` for informado, retorna apenas as execuções desse planejamento.
+    """
+    with Session() as session:
+        query = session.query(OptimizationRuns)
+        if planning_id is not None:
+            query = query.filter(OptimizationRuns.planning_id == planning_id)
+        runs = query.order_by(OptimizationRuns.id.desc()).limit(limit).all()
+        logger.info(f"{len(runs)} execuções de otimização recuperadas (planning_id={planning_id})")
+        return runs
+
+
+def check_planning_feasibility(planning_id: int) -> list[dict]:
+    """
+    Verifica rapidamente, sem calcular distâncias, se a frota ativa do depósito comporta os
+    pedidos do planejamento (ver `check_feasibility`). Retorna a lista de problemas encontrados,
+    vazia se nenhum.
+    """
+    with Session() as session:
+        planning = session.query(Planning).options(
+            joinedload(Planning.depot).joinedload(Depots.vehicles),
+            joinedload(Planning.orders)
+        ).filter(Planning.id == planning_id).first()
+        if not planning:
+            return []
+        orders = sorted(planning.orders, key=lambda o: o.id)
+        vehicles = [v for v in planning.depot.vehicles if v.active]
+        return check_feasibility({
+            "demands": [0] + [order.demand for order in orders],
+            "vehicle_capacities": [v.capacity for v in vehicles],
+            "depot": 0,
+        })
+
+
+def run_optimization(planning_id: int, portfolio: bool = False, engine: str = "ortools",
+                     profile: str = "default", on_solution=None, drop_unserved: bool = False,
+                     neighbors: int | None = None, minimize_makespan: bool = False,
+                     should_stop=None) -> bool:
+    """
+    Executa a otimização de um planejamento já reservado por `start_optimization`
+    (status 'optimizing') e grava as rotas encontradas, deixando-o 'ready'.
+    Planejamentos que já tinham rotas são re-otimizados: a busca parte das rotas existentes
+    e os pedidos novos são inseridos nelas pela inserção mais barata.
+    Se `portfolio` for True, várias estratégias do solver são executadas em paralelo
+    (ver `solve_vrp_portfolio`) e a melhor solução é mantida.
+    `engine` escolhe o método de solução:
+    - "ortools": OR-Tools (padrão);
+    - "savings": apenas a heurística de economias + 2-opt/or-opt (milissegundos, para prévias);
+    - "savings+ortools": OR-Tools partindo da solução da heurística de economias.
+    `profile` é o nome de um perfil de parâmetros do solver (ver `SOLVER_PROFILES`).
+    `on_solution` recebe cada solução melhor encontrada pelo OR-Tools (ver `solve_vrp`);
+    se retornar True, a busca para e a melhor solução até então é gravada. `should_stop` é consultada
+    periodicamente durante a busca, mesmo sem soluções melhores, com o mesmo efeito.
+    Se a mesma instância (mesmos nós da malha, demandas, frota, parâmetros e grafo) já foi
+    resolvida, a solução vem do cache sem recalcular a matriz nem executar o solver.
+    Cada execução grava sua telemetria em `optimization_runs` (ver `get_optimization_runs`).
+    Antes de calcular distâncias, a capacidade da frota é verificada (ver `check_feasibility`);
+    depois, as paradas sem caminho na malha viária. Se houver problemas, a otimização falha
+    imediatamente, a menos que `drop_unserved` seja True: nesse caso o OR-Tools pode deixar
+    pedidos de fora (com penalidade), que permanecem no planejamento sem rota.
+    Com `neighbors` (k), a matriz é esparsa: apenas os k vizinhos mais próximos de cada parada
+    são calculados na malha viária e os demais arcos recebem um limite superior da distância real
+    (ver `Graph.node_sparse_distance_matrix`). As distâncias gravadas nas rotas são sempre as reais.
+    Se o planejamento tiver prazo (`Planning.deadline`), as rotas partem agora e cada uma deve
+    voltar ao depósito até o prazo, considerando os tempos de viagem pela malha e
+    SERVICE_TIME_SECONDS por pedido. Com `minimize_makespan`, o solver também minimiza a duração
+    da rota mais longa.
+    Em caso de falha, inclusive por exceção, o planejamento volta ao status anterior.
+    Retorna True se a otimização for concluída com sucesso, False caso contrário.
+    """
+    started = time.perf_counter()
+    try:
+        return _run_optimization(planning_id, portfolio, engine, profile, on_solution, drop_unserved,
+                                 neighbors, minimize_makespan, should_stop)
+    except Exception:
+        logger.exception(f"Erro ao otimizar o planejamento id={planning_id}.")
+        release_planning(planning_id)
+        engine_label = f"{engine}/portfolio" if portfolio else engine
+        _record_run(planning_id, profile, engine_label, "error", {"total": time.perf_counter() - started})
+        return False
+
+
+def _run_optimization(planning_id: int, portfolio: bool, engine: str, profile: str, on_solution,
+                      drop_unserved: bool, neighbors: int | None, minimize_makespan: bool,
+                      should_stop) -> bool:
+    """Corpo de `run_optimization`, sem o tratamento de exceções."""
+    started = time.perf_counter()
+    timings = {}
+    engine_label = f"{engine}/portfolio" if portfolio else engine
+    with Session() as session:
+        planning = session.query(Planning).options(
+            joinedload(Planning.depot).joinedload(Depots.vehicles),
+            joinedload(Planning.orders).joinedload(Orders.customer),
+            joinedload(Planning.routes)
+        ).filter(Planning.id == planning_id).first()
+        if planning and planning.status == PlanningStatus.optimizing:
+            # Ordem canônica de pedidos e veículos: o nó i da matriz é o pedido orders[i - 1]
+            orders = sorted(planning.orders, key=lambda o: o.id)
             # veículos disponíveis
-            vehicles = [v for v in planning.depot.vehicles if v.active]
+            vehicles = sorted((v for v in planning.depot.vehicles if v.active), key=lambda v: v.id)
             if not vehicles:
                 logger.error(f"Não há veículos ativos disponíveis no depósito id={planning.depot.id} para o planejamento id={planning_id}.")
-                planning.status = PlanningStatus.pending
+                planning.status = _status_after_failure(planning)
                 session.commit()
+                timings["total"] = time.perf_counter() - started
+                _record_run(planning_id, profile, engine_label, "no_vehicles", timings, num_orders=len(orders))
                 return False
+            router_input_data = {}
+            # coordenada do depósito
+            depot_coord = (planning.depot.latitude, planning.depot.longitude)
+            coords = [depot_coord] + [(order.customer.latitude, order.customer.longitude) for order in orders]
             router_input_data["num_vehicles"] = len(vehicles)
             router_input_data["vehicle_capacities"] = [v.capacity for v in vehicles]
-            router_input_data["demands"] = [order.demand for order in planning.orders]
-            router_input_data["vehicle_costs"] = [v.cost_per_km for v in vehicles]
+            router_input_data["demands"] = [0] + [order.demand for order in orders]
+            router_input_data["vehicle_costs"] = [_cost_per_km(v) for v in vehicles]
             router_input_data["depot"] = 0  # O depósito é o primeiro nó na matriz de distâncias
-            
-            sol = solve_vrp(router_input_data)
-            if sol is None:
+            router_input_data.update(SOLVER_PROFILES[profile])
+            if drop_unserved:
+                router_input_data["drop_penalty"] = DROP_PENALTY
+            use_time = planning.deadline is not None or minimize_makespan
+            decompose = _use_decomposition(planning, orders, engine, use_time, drop_unserved)
+            if use_time:
+                router_input_data["service_times"] = [0] + [SERVICE_TIME_SECONDS] * len(orders)
+                router_input_data["minimize_makespan"] = minimize_makespan
+            if planning.deadline is not None:
+                now = datetime.now(timezone.utc)
+                router_input_data["route_time_limit"] = int((_as_utc(planning.deadline) - now).total_seconds())
+
+            def infeasible(issues: list[dict]) -> bool:
+                """Registra os problemas; retorna True se a otimização deve ser interrompida."""
+                for issue in issues:
+                    log = logger.warning if drop_unserved else logger.error
+                    log(f"Planejamento id={planning_id} inviável ({issue['reason']}): {issue['message']}")
+                if not issues or drop_unserved:
+                    return False
+                planning.status = _status_after_failure(planning)
+                session.commit()
+                timings["total"] = time.perf_counter() - started
+                _record_run(planning_id, profile, engine_label, "infeasible", timings,
+                            num_orders=len(orders), num_vehicles=len(vehicles))
+                return True
+
+            if router_input_data.get("route_time_limit", 1) <= 0:
+                # Prazo vencido: nenhum pedido pode ser atendido, nem descartando os demais
+                logger.error(f"Planejamento id={planning_id} inviável (deadline): "
+                             f"o prazo ({planning.deadline}) já passou.")
+                planning.status = _status_after_failure(planning)
+                session.commit()
+                timings["total"] = time.perf_counter() - started
+                _record_run(planning_id, profile, engine_label, "infeasible", timings,
+                            num_orders=len(orders), num_vehicles=len(vehicles))
+                return False
+            if infeasible(check_feasibility(router_input_data)):
+                return False
+            step = time.perf_counter()
+            nodes = graph.snap(coords)
+            timings["snapping"] = time.perf_counter() - step
+
+            cache_key = solution_cache.key(
+                nodes=nodes, demands=router_input_data["demands"],
+                capacities=router_input_data["vehicle_capacities"], costs=router_input_data["vehicle_costs"],
+                profile=profile, engine=engine, portfolio=portfolio, graph=graph.version,
+                drop_unserved=drop_unserved, neighbors=neighbors, minimize_makespan=minimize_makespan,
+                # Em minutos: a duração disponível diminui com o tempo até o prazo
+                route_time_limit=router_input_data.get("route_time_limit", 0) // 60
+            )
+            sol = solution_cache.get(cache_key)
+            status = "cached"
+            if sol is not None:
+                logger.info(f"Planejamento id={planning_id}: solução recuperada do cache.")
+            else:
+                step = time.perf_counter()
+                candidates, matrix_builder = None, None
+                if decompose or (neighbors and neighbors < len(nodes) - 1):
+                    router_input_data["distance_matrix"], candidates = \
+                        graph.node_sparse_distance_matrix(nodes, neighbors or DECOMPOSITION_NEIGHBORS)
+                    unreachable = unreachable_nodes(router_input_data["distance_matrix"])
+                    if decompose:
+                        # Cada cluster calcula a sua matriz exata (ver `solve_vrp_decomposed`);
+                        # a matriz esparsa serve apenas à busca local entre clusters
+                        def matrix_builder(cluster_nodes: list[int]) -> np.ndarray:
+                            return graph.node_distance_matrix([nodes[i] for i in cluster_nodes],
+                                                              engine="dijkstra")
+                else:
+                    router_input_data["distance_matrix"] = graph.node_distance_matrix(nodes, engine="dijkstra")
+                    unreachable = unreachable_nodes(router_input_data["distance_matrix"])
+                timings["matrix"] = time.perf_counter() - step
+                if infeasible([{
+                    "reason": "unreachable", "nodes": unreachable,
+                    "message": f"pedidos {[orders[n - 1].id for n in unreachable]} sem caminho na malha viária "
+                               f"a partir do depósito ou de volta a ele."
+                }] if unreachable else []):
+                    return False
+                if use_time:
+                    step = time.perf_counter()
+                    router_input_data["time_matrix"] = graph.node_travel_time_matrix(nodes)
+                    timings["matrix"] += time.perf_counter() - step
+                    if infeasible([issue for issue in check_feasibility(router_input_data)
+                                   if issue["reason"] == "deadline"]):
+                        return False
+                step = time.perf_counter()
+                sol = _solve_planning(planning, orders, vehicles, router_input_data, coords,
+                                      portfolio, engine, on_solution, should_stop, decompose, matrix_builder)
+                timings["solver"] = time.perf_counter() - step
+                status = "ok"
+                if sol is not None and "error" not in sol:
+                    if candidates is not None:
+                        _exact_route_distances(sol, nodes, router_input_data["distance_matrix"], candidates,
+                                               router_input_data["vehicle_costs"])
+                    solution_cache.put(cache_key, sol)
+            if sol is None or "error" in sol:
                 logger.error(f"Falha ao otimizar o planejamento id={planning_id}.")
-                planning.status = PlanningStatus.pending
+                planning.status = _status_after_failure(planning)
                 session.commit()
+                timings["total"] = time.perf_counter() - started
+                _record_run(planning_id, profile, engine_label, "no_solution", timings,
+                            num_orders=len(orders), num_vehicles=len(vehicles))
                 return False
-            logger.info(f"Solução encontrada para o planejamento id={planning_id}: {sol}")
+            logger.debug(f"Solução encontrada para o planejamento id={planning_id}: {sol}")
+            step = time.perf_counter()
             # ex sol : {'objective': 0, 'routes': {0: {'route': [0, 2, 1, 0], 'distance': np.float64(26173.7203808693)}}
+            # Substitui as rotas anteriores (re-otimização) pelas da solução, em lote
+            routes = []
+            for vehicle_idx, route_info in sol['routes'].items():
+                stops = [orders[node - 1] for node in route_info['route'][1:-1]]  # Ignora o depósito (0)
+                routes.append({"planning_id": planning_id, "vehicle_id": vehicles[int(vehicle_idx)].id,
+                               "distance": float(route_info['distance']),
+                               "load": float(sum(order.demand for order in stops)),
+                               "orders": [order.id for order in stops], "legs": route_info.get("legs")})
+            _save_routes(session, [planning_id], [order.id for order in orders], routes)
             # Atualiza o planejamento com a solução otimizada
             planning.status = PlanningStatus.ready
+            if sol.get("dropped"):
+                # Pedidos não atendidos continuam no planejamento, pendentes e sem rota
+                logger.warning(f"Planejamento id={planning_id}: pedidos não atendidos (sem rota): "
+                               f"{[orders[n - 1].id for n in sol['dropped']]}")
+            if "max_route_time" in sol:
+                logger.info(f"Planejamento id={planning_id}: rota mais longa leva {sol['max_route_time'] / 60:.0f} min.")
             session.commit()
-            # criar routes
-            for vehicle_id, route_info in sol['routes'].items():
-                route = Routes(planning_id=planning_id, vehicle_id=vehicle_id,
-                               distance=route_info['distance'])
-                session.add(route)
-                #atualizar ordens associadas
-                for order_index in route_info['route'][1:-1]:  # Ignora o depósito (0)
-                    order = planning.orders[order_index - 1]  # Ajusta o índice para a lista de pedidos
-                    order.status = OrderStatus.processing
-                    order.route_id = route.id
-                    order.sequence_position = order_index  # Posição na rota
-            session.commit()
-            
-            
-            logger.info(f"Dados de otimização preparados para o planejamento id={planning_id}: {router_input_data}")
+            timings["persistence"] = time.perf_counter() - step
+            timings["total"] = time.perf_counter() - started
+            _record_run(planning_id, profile, engine_label, status, timings, num_orders=len(orders),
+                        num_vehicles=len(vehicles), objective=_fleet_cost(sol, vehicles))
             return True
         else:
             status_info = planning.status if planning else "não encontrado"
-            logger.warning(f"Planejamento id={planning_id} não pode ser otimizado. Status atual: {status_info}.")
+            logger.warning(f"Planejamento id={planning_id} não está reservado para otimização. Status atual: {status_info}.")
+        return False
+
+
+def optimize_planning(planning_id: int, portfolio: bool = False, engine: str = "ortools",
+                      profile: str = "default", drop_unserved: bool = False,
+                      neighbors: int | None = None, minimize_makespan: bool = False) -> bool:
+    """
+    Otimiza o planejamento de forma síncrona: reserva-o ('optimizing') e executa
+    `run_optimization` com os mesmos parâmetros.
+    Retorna True se a otimização for concluída com sucesso, False caso contrário.
+    """
+    if not start_optimization(planning_id):
         return False
+    return run_optimization(planning_id, portfolio=portfolio, engine=engine, profile=profile,
+                            drop_unserved=drop_unserved, neighbors=neighbors,
+                            minimize_makespan=minimize_makespan)
+
+
+def optimize_plannings_jointly(planning_ids: list[int], profile: str = "default") -> bool:
+    """
+    Otimiza vários planejamentos pendentes, de depósitos distintos, como um único problema com
+    vários depósitos: cada veículo parte do seu depósito e volta a ele, e cada pedido pode ser
+    atendido por qualquer depósito. As rotas são gravadas no planejamento do depósito do veículo;
+    pedidos atendidos por outro depósito passam para o planejamento desse depósito.
+    Planejamentos sem rotas ao final (ex.: depósito sem veículos ativos) voltam para 'pending'.
+    Somente planejamentos 'pending' e sem prazo são aceitos: o problema conjunto não tem
+    dimensão de tempo, e um pedido pode mudar para o planejamento de outro depósito.
+    Retorna True se a otimização for concluída com sucesso, False caso contrário.
+    """
+    started = time.perf_counter()
+    timings = {}
+    engine_label = "ortools/multi-depot"
+    with Session() as session:
+        plannings = session.query(Planning).filter(Planning.id.in_(planning_ids)).all()
+        depot_ids = [p.depot_id for p in plannings]
+        if len(plannings) != len(set(planning_ids)) or len(set(depot_ids)) != len(depot_ids):
+            logger.warning(f"Otimização conjunta exige planejamentos existentes de depósitos distintos: {planning_ids}.")
+            return False
+        rejected = [p.id for p in plannings if p.status != PlanningStatus.pending or p.deadline is not None]
+        if rejected:
+            logger.warning(f"Otimização conjunta aceita apenas planejamentos pendentes e sem prazo: {rejected}.")
+            return False
+    reserved = []
+    for planning_id in sorted(set(planning_ids)):
+        if not start_optimization(planning_id):
+            for reserved_id in reserved:
+                release_planning(reserved_id)
+            return False
+        reserved.append(planning_id)
+
+    def fail(session, plannings, status: str, num_orders: int = 0, num_vehicles: int = 0) -> bool:
+        for planning in plannings:
+            planning.status = _status_after_failure(planning)
+        session.commit()
+        timings["total"] = time.perf_counter() - started
+        for planning in plannings:
+            _record_run(planning.id, profile, engine_label, status, timings,
+                        num_orders=num_orders, num_vehicles=num_vehicles)
+        return False
+
+    with Session() as session:
+        plannings = session.query(Planning).options(
+            joinedload(Planning.depot).joinedload(Depots.vehicles),
+            joinedload(Planning.orders).joinedload(Orders.customer),
+            joinedload(Planning.routes)
+        ).filter(Planning.id.in_(reserved)).order_by(Planning.id).all()
+        # Nós: um por depósito (na ordem dos planejamentos), seguidos dos pedidos
+        orders = sorted((o for p in plannings for o in p.orders), key=lambda o: o.id)
+        vehicles, vehicle_depot = [], []
+        for depot_idx, planning in enumerate(plannings):
+            for v in sorted((v for v in planning.depot.vehicles if v.active), key=lambda v: v.id):
+                vehicles.append(v)
+                vehicle_depot.append(depot_idx)
+        num_depots = len(plannings)
+        if not vehicles:
+            logger.error(f"Não há veículos ativos nos depósitos dos planejamentos {reserved}.")
+            return fail(session, plannings, "no_vehicles", num_orders=len(orders))
+
+        router_input_data = {
+            "num_vehicles": len(vehicles),
+            "vehicle_capacities": [v.capacity for v in vehicles],
+            "vehicle_costs": [_cost_per_km(v) for v in vehicles],
+            "demands": [0] * num_depots + [order.demand for order in orders],
+            "depot": 0,
+            "starts": vehicle_depot,
+            "ends": vehicle_depot,
+            **SOLVER_PROFILES[profile],
+        }
+        issues = check_feasibility(router_input_data)
+        for issue in issues:
+            logger.error(f"Planejamentos {reserved} inviáveis ({issue['reason']}): {issue['message']}")
+        if issues:
+            return fail(session, plannings, "infeasible", len(orders), len(vehicles))
+
+        coords = [(p.depot.latitude, p.depot.longitude) for p in plannings] + \
+                 [(order.customer.latitude, order.customer.longitude) for order in orders]
+        step = time.perf_counter()
+        nodes = graph.snap(coords)
+        timings["snapping"] = time.perf_counter() - step
+        step = time.perf_counter()
+        matrix = graph.node_distance_matrix(nodes, engine="dijkstra")
+        router_input_data["distance_matrix"] = matrix
+        timings["matrix"] = time.perf_counter() - step
+        # Pedidos que nenhum depósito alcança (ida e volta)
+        unreachable = set.intersection(*(set(unreachable_nodes(matrix, d)) for d in range(num_depots)))
+        unreachable -= set(range(num_depots))
+        if unreachable:
+            logger.error(f"Planejamentos {reserved}: pedidos {[orders[n - num_depots].id for n in unreachable]} "
+                         f"sem caminho na malha viária a partir de nenhum depósito.")
+            return fail(session, plannings, "infeasible", len(orders), len(vehicles))
+
+        step = time.perf_counter()
+        sol = _solve_isolated(router_input_data)
+        timings["solver"] = time.perf_counter() - step
+        if "error" in sol:
+            logger.error(f"Falha na otimização conjunta dos planejamentos {reserved}.")
+            return fail(session, plannings, "no_solution", len(orders), len(vehicles))
+
+        step = time.perf_counter()
+        routed = {p.id: 0 for p in plannings}
+        moved = 0
+        routes = []
+        for vehicle_idx, route_info in sol["routes"].items():
+            planning = plannings[vehicle_depot[vehicle_idx]]
+            stops = [orders[node - num_depots] for node in route_info["route"][1:-1]]
+            moved += sum(1 for order in stops if order.planning_id != planning.id)
+            routed[planning.id] += len(stops)
+            routes.append({"planning_id": planning.id, "vehicle_id": vehicles[vehicle_idx].id,
+                           "distance": float(route_info["distance"]),
+                           "load": float(sum(order.demand for order in stops)),
+                           "orders": [order.id for order in stops], "legs": route_info.get("legs")})
+        _save_routes(session, reserved, [order.id for order in orders], routes)
+        for planning in plannings:
+            planning.status = PlanningStatus.ready if routed[planning.id] else PlanningStatus.pending
+        session.commit()
+        timings["persistence"] = time.perf_counter() - step
+        timings["total"] = time.perf_counter() - started
+        logger.info(f"Otimização conjunta dos planejamentos {reserved}: {moved} pedidos atendidos por "
+                    f"outro depósito.")
+        for planning in plannings:
+            _record_run(planning.id, profile, engine_label, "ok", timings, num_orders=routed[planning.id],
+                        num_vehicles=sum(1 for d in vehicle_depot if plannings[d].id == planning.id),
+                        objective=_fleet_cost({"routes": {v: r for v, r in sol["routes"].items()
+                                                          if plannings[vehicle_depot[v]].id == planning.id}},
+                                              vehicles))
+        return True
+
+
+def _init_batch_worker():
+    """Inicialização de cada processo do pool: conexões herdadas não podem ser reutilizadas após o fork."""
+    engine.dispose(close=False)
+
+
+def _optimize_in_worker(planning_id: int, options: dict) -> tuple[int, bool, float]:
+    """Tarefa do pool: otimiza um planejamento e retorna (id, sucesso, tempo em segundos)."""
+    started = time.perf_counter()
+    try:
+        ok = optimize_planning(planning_id, **options)
+    except Exception:
+        logger.exception(f"Erro ao otimizar o planejamento id={planning_id}.")
+        release_planning(planning_id)
+        ok = False
+    return planning_id, ok, time.perf_counter() - started
+
+
+def optimize_pending_plannings(workers: int | None = None, **options) -> dict:
+    """
+    Otimiza todos os planejamentos 'pending', em paralelo, em um pool de `workers` processos
+    (padrão: número de CPUs). As opções são repassadas a `optimize_planning` (ex.: profile, engine).
+    Os processos compartilham o grafo já carregado (herdado do processo atual) e o cache de
+    soluções em disco. Planejamentos reservados por outra otimização no meio do caminho são ignorados.
+
+    Returns:
+        Um resumo com os IDs otimizados ("optimized") e com falha ("failed"), o tempo de cada
+        planejamento ("times") e o tempo total ("total_time").
+    """
+    started = time.perf_counter()
+    with Session() as session:
+        planning_ids = [pid for (pid,) in session.query(Planning.id)
+                        .filter(Planning.status == PlanningStatus.pending).order_by(Planning.id)]
+    summary = {"optimized": [], "failed": [], "times": {}, "total_time": 0.0}
+    if not planning_ids:
+        logger.info("Nenhum planejamento pendente para otimizar.")
+        return summary
+    workers = min(workers or os.cpu_count() or 1, len(planning_ids))
+    logger.info(f"Otimizando {len(planning_ids)} planejamentos pendentes com {workers} processos.")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as pool:
+        futures = [pool.submit(_optimize_in_worker, pid, options) for pid in planning_ids]
+        for future in as_completed(futures):
+            planning_id, ok, elapsed = future.result()
+            summary["optimized" if ok else "failed"].append(planning_id)
+            summary["times"][planning_id] = elapsed
+    summary["optimized"].sort()
+    summary["failed"].sort()
+    summary["total_time"] = time.perf_counter() - started
+    logger.info(f"Otimização em lote concluída em {summary['total_time']:.1f}s: "
+                f"{len(summary['optimized'])} otimizados, {len(summary['failed'])} com falha "
+                f"{summary['failed'] or ''}".rstrip())
+    return summary
 
 
 if __name__ == "__main__":
-    # Exemplo de uso:  otimizar um planejamento específico
-    planning_id = 1  # Substitua pelo ID do planejamento que deseja otimizar
-    optimize_planning(planning_id)
\ No newline at end of file
+    # Uso:
+    #   python -m backend.controler 1                 # otimiza o planejamento 1
+    #   python -m backend.controler --all-pending     # otimiza todos os pendentes (ex.: cron noturno)
+    parser = argparse.ArgumentParser(description="Otimização de planejamentos.")
+    parser.add_argument("planning_id", nargs="?", type=int, help="ID do planejamento a otimizar")
+    parser.add_argument("--all-pending", action="store_true", help="Otimiza todos os planejamentos pendentes")
+    parser.add_argument("--workers", type=int, help="Processos simultâneos (padrão: número de CPUs)")
+    parser.add_argument("--profile", default="default", choices=list(SOLVER_PROFILES), help="Perfil do solver")
+    parser.add_argument("--engine", default="ortools", choices=["ortools", "savings", "savings+ortools"],
+                        help="Método de solução")
+    args = parser.parse_args()
+
+    if args.all_pending:
+        result = optimize_pending_plannings(workers=args.workers, profile=args.profile, engine=args.engine)
+        for planning_id in result["optimized"] + result["failed"]:
+            status = "ok" if planning_id in result["optimized"] else "falha"
+            print(f"Planejamento {planning_id}: {status} ({result['times'][planning_id]:.1f}s)")
+        print(f"Total: {len(result['optimized'])} otimizados, {len(result['failed'])} com falha, "
+              f"{result['total_time']:.1f}s")
+        raise SystemExit(1 if result["failed"] else 0)
+    elif args.planning_id is not None:
+        ok = optimize_planning(args.planning_id, profile=args.profile, engine=args.engine)
+        raise SystemExit(0 if ok else 1)
+    else:
+        parser.print_help()
\ No newline at end of file
@@ -1,17 +1,22 @@
 import networkx as nx
 import osmnx as ox
 import os
+import hashlib
+import heapq
 import numpy as np
 
 # Default settings for Graph class
 _DEFAULT_GRAPH_FILE_NAME = "fortaleza.ghml"
 _DEFAULT_CITY = "Fortaleza, Ceará, Brasil"
+# Velocidade (km/h) das vias sem `maxspeed` cujo tipo não permite estimá-la
+_DEFAULT_SPEED_KPH = 30
 
 
 class Graph:
     def __init__(self, graph_file_name=_DEFAULT_GRAPH_FILE_NAME):
         self.graph = nx.MultiDiGraph()
         self._graph_file_name = graph_file_name
+        self.searches = 0  # número de buscas de caminho mínimo executadas (usado em benchmarks)
         self._load_graph()
 
     def _load_graph(self):
@@ -24,6 +29,11 @@ class Graph:
             print(f"Salvando o grafo como {self._graph_file_name}...")
             ox.save_graphml(self.graph, self._graph_file_name)
             print("Grafo salvo localmente.")
+        # Versão do grafo: muda sempre que o arquivo local é substituído
+        stat = os.stat(self._graph_file_name)
+        self.version = hashlib.sha256(
+            f"{os.path.basename(self._graph_file_name)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+        ).hexdigest()[:16]
             
     
     def distance(self, coord1, coord2):
@@ -33,12 +43,39 @@ class Graph:
             self._nodes[coord1] = ox.distance.nearest_nodes(self.graph, coord1[1], coord1[0])
         if coord2 not in self._nodes:
             self._nodes[coord2] = ox.distance.nearest_nodes(self.graph, coord2[1], coord2[0])
+        self.searches += 1
         return nx.shortest_path_length(self.graph, source=self._nodes[coord1], target=self._nodes[coord2], weight='length')
    
    
-    def distance_matrix(self, coords: list[tuple[float, float]]) -> np.ndarray:
+    def snap(self, coords: list[tuple[float, float]]) -> list[int]:
+        """Mapeia coordenadas (latitude, longitude) para os nós mais próximos do grafo."""
+        if not coords:
+            return []
+        lats, lons = zip(*coords)
+        return [int(node) for node in ox.distance.nearest_nodes(self.graph, list(lons), list(lats))]
+
+    def distance_matrix(self, coords: list[tuple[float, float]], engine: str = "pairwise") -> np.ndarray:
         # Mapeia coordenadas para nós
-        nodes = [ox.distance.nearest_nodes(self.graph, coord[1], coord[0]) for coord in coords]
+        return self.node_distance_matrix(self.snap(coords), engine=engine)
+
+    def node_distance_matrix(self, nodes: list[int], engine: str = "pairwise", weight: str = "length") -> np.ndarray:
+        """
+        Matriz de distâncias (em metros) entre nós do grafo já mapeados por `snap`.
+        Com `weight="travel_time"`, a matriz é de tempos de viagem, em segundos
+        (ver `node_travel_time_matrix`).
+
+        Engines:
+            - "pairwise": uma busca do networkx por par de nós (n² buscas).
+            - "dijkstra": uma busca por nó de origem, que para ao alcançar todos os demais (n buscas).
+        """
+        if engine == "dijkstra":
+            mat = self.node_distances(nodes, nodes, weight=weight)
+            np.fill_diagonal(mat, 0)
+            return mat
+        if engine != "pairwise":
+            raise ValueError(f"Engine de matriz de distâncias desconhecida: {engine}")
+        if weight == "travel_time":
+            self._ensure_travel_times()
         n = len(nodes)
         mat = np.zeros((n, n))
 
@@ -46,12 +83,133 @@ class Graph:
         for i, node1 in enumerate(nodes):
             for j, node2 in enumerate(nodes):
                 if i != j:
+                    self.searches += 1
                     try:
-                        mat[i, j] = nx.shortest_path_length(self.graph, source=node1, target=node2, weight='length')
+                        mat[i, j] = nx.shortest_path_length(self.graph, source=node1, target=node2, weight=weight)
                     except nx.NetworkXNoPath:
                         mat[i, j] = np.inf
         return mat
     
+    def _ensure_travel_times(self):
+        """
+        Adiciona às arestas a velocidade (`speed_kph`, de `maxspeed`, estimada pelo tipo de via ou,
+        na falta de ambos, _DEFAULT_SPEED_KPH) e o tempo de viagem (`travel_time`, em segundos),
+        se o grafo ainda não os tiver.
+        """
+        if not all('travel_time' in d for _, _, d in self.graph.edges(data=True)):
+            ox.add_edge_speeds(self.graph, fallback=_DEFAULT_SPEED_KPH)
+            ox.add_edge_travel_times(self.graph)
+
+    def _adjacency(self, reverse: bool = False, weight: str = 'length') -> dict:
+        """
+        Listas de adjacência compactas {nó: [(vizinho, peso), ...]}, com o menor peso entre
+        arestas paralelas. Construídas uma única vez por sentido e atributo de peso.
+        """
+        if not hasattr(self, '_adj'):
+            self._adj = {}
+        key = (reverse, weight)
+        if key not in self._adj:
+            if weight == 'travel_time':
+                self._ensure_travel_times()
+            source = self.graph.pred if reverse else self.graph.succ
+            self._adj[key] = {
+                u: [(v, min(d.get(weight, 1) for d in edges.values())) for v, edges in nbrs.items()]
+                for u, nbrs in source.items()
+            }
+        return self._adj[key]
+
+    def _dijkstra(self, source: int, targets, reverse: bool = False, limit: int | None = None,
+                  weight: str = 'length') -> dict[int, float]:
+        """
+        Dijkstra a partir de `source` que para assim que todos os `targets` forem alcançados,
+        ou assim que os `limit` alvos mais próximos forem alcançados, se `limit` for informado.
+        Com `reverse=True`, percorre as arestas no sentido contrário, obtendo a distância
+        de cada alvo até `source`. Alvos inalcançáveis ficam fora do dicionário retornado.
+        `weight` é o atributo das arestas usado como custo ('length' ou 'travel_time').
+        """
+        adj = self._adjacency(reverse, weight)
+        self.searches += 1
+        remaining = set(targets)
+        if limit is not None:
+            limit = min(limit, len(remaining))
+        dist = {source: 0.0}
+        found = {}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u in remaining:
+                remaining.discard(u)
+                found[u] = d
+                if limit is not None and len(found) >= limit:
+                    break
+            for v, w in adj.get(u, ()):
+                nd = d + w
+                if nd < dist.get(v, np.inf):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return found
+
+    def node_distances(self, sources: list[int], targets: list[int], reverse: bool = False,
+                       weight: str = 'length') -> np.ndarray:
+        """
+        Distâncias (em metros) apenas entre os pares de `sources` e `targets`, com uma busca por nó.
+        Sem `reverse`, retorna a matriz len(sources) x len(targets) das distâncias de cada origem
+        até cada alvo. Com `reverse=True`, cada nó de `sources` é tratado como destino: a linha i
+        contém a distância de cada nó de `targets` até sources[i].
+        Pares sem caminho recebem np.inf. `weight` como em `_dijkstra`.
+        """
+        mat = np.full((len(sources), len(targets)), np.inf)
+        for i, source in enumerate(sources):
+            found = self._dijkstra(source, targets, reverse=reverse, weight=weight)
+            for j, target in enumerate(targets):
+                if target in found:
+                    mat[i, j] = found[target]
+        return mat
+
+    def node_travel_time_matrix(self, nodes: list[int]) -> np.ndarray:
+        """
+        Matriz de tempos de viagem (em segundos) entre nós do grafo já mapeados por `snap`,
+        pelas velocidades das vias (`maxspeed`, ou estimadas pelo tipo de via quando ausente).
+        """
+        return self.node_distance_matrix(nodes, engine="dijkstra", weight="travel_time")
+
+    def node_sparse_distance_matrix(self, nodes: list[int], k: int, depot: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Matriz de distâncias esparsa (lista de candidatos): calcula na malha viária apenas as
+        distâncias de cada nó até os seus `k` vizinhos mais próximos, com uma busca interrompida
+        por nó, além da linha e da coluna completas do depósito (posição `depot`).
+        Os demais arcos são penalizados com um limite superior garantido da distância real: o
+        menor caminho de dois trechos já calculados (i -> vizinho de i -> j, ou i -> depósito -> j).
+        Esse caminho existe de fato, então o solver nunca vê um arco fora da lista mais barato
+        do que ele realmente é.
+        Retorna a matriz e a máscara booleana dos arcos calculados de fato.
+        """
+        n = len(nodes)
+        mat = np.full((n, n), np.inf)
+        mat[depot, :] = self.node_distances([nodes[depot]], nodes)[0]
+        mat[:, depot] = self.node_distances([nodes[depot]], nodes, reverse=True)[0]
+        for i, source in enumerate(nodes):
+            if i == depot:
+                continue
+            # O próprio nó é o primeiro alvo alcançado
+            found = self._dijkstra(source, nodes, limit=k + 1)
+            for j, target in enumerate(nodes):
+                if target in found:
+                    mat[i, j] = found[target]
+        np.fill_diagonal(mat, 0)
+        candidates = np.isfinite(mat)
+        # A linha e a coluna do depósito são exatas (inclusive as distâncias infinitas)
+        candidates[depot, :] = candidates[:, depot] = True
+        estimate = np.empty_like(mat)
+        for i in range(n):
+            # Caminhos i -> m -> j por um nó intermediário m com o arco (i, m) calculado
+            # (o depósito está sempre entre eles)
+            via = np.flatnonzero(candidates[i])
+            estimate[i] = (mat[i, via][:, None] + mat[via, :]).min(axis=0)
+        return np.where(candidates, mat, estimate), candidates
+
     def route(self, coord1, coord2):
         if not hasattr(self, '_nodes'):
             self._nodes = {}
@@ -59,6 +217,7 @@ class Graph:
             self._nodes[coord1] = ox.distance.nearest_nodes(self.graph, coord1[1], coord1[0])
         if coord2 not in self._nodes:
             self._nodes[coord2] = ox.distance.nearest_nodes(self.graph, coord2[1], coord2[0])
+        self.searches += 1
         nodes =  nx.shortest_path(self.graph, source=self._nodes[coord1], target=self._nodes[coord2], weight='length')
         return [(self.graph.nodes[node]['y'], self.graph.nodes[node]['x']) for node in nodes]
 
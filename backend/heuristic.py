@@ -0,0 +1,194 @@
+"""
+Heurística rápida para o VRP capacitado, implementada apenas com NumPy:
+economias de Clarke-Wright seguidas de melhoria 2-opt e or-opt em cada rota.
+Usa o mesmo formato de entrada e saída de `solve_vrp` (backend/router.py) e serve
+para prévias instantâneas ou como solução inicial para o OR-Tools.
+"""
+import numpy as np
+
+
+def _savings_routes(dist: np.ndarray, depot: int, customers: np.ndarray,
+                    demands: np.ndarray, capacity: float) -> list[list[int]]:
+    """
+    Constrói rotas pelo algoritmo de economias (Clarke-Wright, versão paralela).
+    A economia de ligar o fim da rota que termina em i ao início da rota que começa em j é
+    s(i, j) = d(i, depot) + d(depot, j) - d(i, j).
+    """
+    routes = {int(c): [int(c)] for c in customers}  # rotas indexadas pelo primeiro nó
+    route_of = {int(c): int(c) for c in customers}  # nó -> chave da rota
+    loads = {int(c): float(demands[c]) for c in customers}
+
+    sub = dist[np.ix_(customers, customers)]
+    savings = dist[customers, depot][:, None] + dist[depot, customers][None, :] - sub
+    np.fill_diagonal(savings, -np.inf)
+    candidates = np.argwhere(savings > 0)
+    order = np.argsort(-savings[candidates[:, 0], candidates[:, 1]], kind="stable")
+
+    for a, b in candidates[order]:
+        i, j = int(customers[a]), int(customers[b])
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj or routes[ri][-1] != i or routes[rj][0] != j:
+            continue
+        if loads[ri] + loads[rj] > capacity:
+            continue
+        routes[ri].extend(routes[rj])
+        loads[ri] += loads.pop(rj)
+        for node in routes.pop(rj):
+            route_of[node] = ri
+    return list(routes.values())
+
+
+def _two_opt(path: np.ndarray, dist: np.ndarray) -> np.ndarray:
+    """
+    Melhoria 2-opt vetorizada de uma rota (com o depósito nas pontas), válida para matrizes
+    assimétricas: o custo do segmento invertido é calculado com as somas prefixadas dos arcos
+    no sentido direto e reverso. Aplica o melhor movimento até não haver melhoria.
+    """
+    while len(path) > 4:
+        fwd = np.concatenate(([0.0], np.cumsum(dist[path[:-1], path[1:]])))
+        rev = np.concatenate(([0.0], np.cumsum(dist[path[1:], path[:-1]])))
+        m = len(path)
+        i = np.arange(1, m - 2)[:, None]  # primeira posição do segmento invertido
+        j = np.arange(2, m - 1)[None, :]  # última posição do segmento invertido
+        delta = (dist[path[i - 1], path[j]] + dist[path[i], path[j + 1]]
+                 - dist[path[i - 1], path[i]] - dist[path[j], path[j + 1]]
+                 + (rev[j] - rev[i]) - (fwd[j] - fwd[i]))
+        delta = np.where(j > i, delta, np.inf)
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[best] >= -1e-9:
+            break
+        bi, bj = best[0] + 1, best[1] + 2
+        path = np.concatenate((path[:bi], path[bi:bj + 1][::-1], path[bj + 1:]))
+    return path
+
+
+def _or_opt(path: np.ndarray, dist: np.ndarray, max_segment: int = 3) -> np.ndarray:
+    """
+    Melhoria or-opt vetorizada: move segmentos de 1 a `max_segment` clientes consecutivos para
+    outra posição da mesma rota. Aplica o melhor movimento até não haver melhoria.
+    """
+    improved = True
+    while improved:
+        improved = False
+        m = len(path)
+        for length in range(1, max_segment + 1):
+            if m - 2 < length + 1:
+                break
+            starts = np.arange(1, m - length)  # segmento path[s:s+length]
+            ends = starts + length - 1
+            removal = (dist[path[starts - 1], path[starts]] + dist[path[ends], path[ends + 1]]
+                       - dist[path[starts - 1], path[ends + 1]])
+            # Inserção entre path[k] e path[k+1], fora do segmento e de suas arestas vizinhas
+            k = np.arange(0, m - 1)[None, :]
+            s, e = starts[:, None], ends[:, None]
+            insertion = dist[path[k], path[s]] + dist[path[e], path[k + 1]] - dist[path[k], path[k + 1]]
+            delta = insertion - removal[:, None]
+            delta = np.where((k < s - 1) | (k > e), delta, np.inf)
+            best = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[best] < -1e-9:
+                bs, bk = int(starts[best[0]]), int(best[1])
+                segment = path[bs:bs + length]
+                rest = np.concatenate((path[:bs], path[bs + length:]))
+                pos = bk + 1 if bk < bs else bk + 1 - length
+                path = np.concatenate((rest[:pos], segment, rest[pos:]))
+                improved = True
+                break
+    return path
+
+
+def _improve(route: list[int], dist: np.ndarray, depot: int) -> list[int]:
+    """Alterna 2-opt e or-opt até que nenhum dos dois melhore a rota."""
+    path = np.array([depot] + route + [depot])
+    while True:
+        cost = dist[path[:-1], path[1:]].sum()
+        path = _or_opt(_two_opt(path, dist), dist)
+        if dist[path[:-1], path[1:]].sum() >= cost - 1e-9:
+            return [int(n) for n in path[1:-1]]
+
+
+def _assign_vehicles(routes: list[list[int]], demands: np.ndarray,
+                     vehicle_capacities: list[int]) -> dict[int, list[int]] | None:
+    """
+    Associa cada rota a um veículo distinto: rotas mais carregadas vão para os veículos de
+    maior capacidade. Retorna None se não houver veículos suficientes ou se alguma rota não couber.
+    """
+    if len(routes) > len(vehicle_capacities):
+        return None
+    by_load = sorted(routes, key=lambda r: -demands[r].sum())
+    by_capacity = sorted(range(len(vehicle_capacities)), key=lambda v: -vehicle_capacities[v])
+    assignment = {}
+    for route, vehicle_id in zip(by_load, by_capacity):
+        if demands[route].sum() > vehicle_capacities[vehicle_id]:
+            return None
+        assignment[vehicle_id] = route
+    return assignment
+
+
+def solve_savings(input_data: dict) -> dict:
+    """
+    Resolve o VRP capacitado com a heurística de economias de Clarke-Wright seguida de
+    busca local 2-opt/or-opt, em milissegundos para centenas de paradas.
+
+    Args:
+        input_data: O mesmo dicionário aceito por `solve_vrp`
+            (distance_matrix, num_vehicles, depot, demands, vehicle_capacities).
+
+    Returns:
+        Um dicionário no mesmo formato retornado por `solve_vrp`:
+            - objective: Soma das distâncias de todas as rotas.
+            - routes: Um dicionário mapeando o ID de cada veículo para sua rota, distância e
+              distância de cada arco da rota ("legs").
+            - max_route_distance: A distância máxima percorrida por um único veículo.
+        Ou um dicionário com uma chave "error" se nenhuma solução for encontrada.
+    """
+    dist = np.asarray(input_data["distance_matrix"], dtype=float)
+    depot = input_data["depot"]
+    demands = np.asarray(input_data["demands"], dtype=float)
+    capacities = input_data["vehicle_capacities"]
+    customers = np.array([n for n in range(len(dist)) if n != depot], dtype=int)
+
+    # Com frota heterogênea, tenta limites de carga decrescentes até que as rotas
+    # possam ser distribuídas entre os veículos.
+    assignment = None
+    for capacity in sorted(set(capacities), reverse=True):
+        routes = _savings_routes(dist, depot, customers, demands, capacity)
+        assignment = _assign_vehicles(routes, demands, capacities)
+        if assignment is not None:
+            break
+    if assignment is None:
+        return {"error": "No solution found"}
+
+    result_routes = {}
+    for vehicle_id in range(input_data["num_vehicles"]):
+        stops = _improve(assignment[vehicle_id], dist, depot) if vehicle_id in assignment else []
+        route = [depot] + stops + [depot]
+        legs = dist[route[:-1], route[1:]]
+        result_routes[vehicle_id] = {"route": route, "distance": float(legs.sum()), "legs": legs.tolist()}
+    distances = [r["distance"] for r in result_routes.values()]
+    return {
+        "objective": int(round(sum(distances))),
+        "routes": result_routes,
+        "max_route_distance": max(distances, default=0),
+    }
+
+
+def routes_from_solution(solution: dict, num_vehicles: int) -> list[list[int]]:
+    """
+    Converte uma solução no formato de `solve_vrp` em rotas iniciais (`initial_routes`),
+    isto é, a lista de nós visitados por veículo, sem o depósito.
+    """
+    return [solution["routes"][v]["route"][1:-1] if v in solution["routes"] else []
+            for v in range(num_vehicles)]
+
+
+if __name__ == "__main__":
+    # Exemplo de utilização com os dados de exemplo do roteirizador
+    from backend.router import create_sample_data
+    result = solve_savings(create_sample_data())
+    if "error" not in result:
+        print("Objective:", result["objective"])
+        for vehicle, route_info in result["routes"].items():
+            print(f"Veículo {vehicle}: Rota: {route_info['route']} - Distância: {route_info['distance']}m")
+        print("Máxima distância percorrida:", result["max_route_distance"], "m")
+    else:
+        print(result["error"])
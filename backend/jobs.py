@@ -0,0 +1,227 @@
+"""
+Fila de otimizações em segundo plano.
+
+Cada otimização roda em um processo próprio, para não bloquear o loop de eventos do
+NiceGUI durante a construção da matriz de distâncias e a execução do solver. O
+planejamento passa para 'optimizing' assim que é enfileirado, a otimização pode ser
+abortada de fato (o processo é encerrado) e o resultado é gravado no banco pelo próprio
+processo ao terminar.
+
+Durante a busca, cada solução melhor encontrada pelo solver é enviada ao processo do
+servidor (`OptimizationJob.progress`), e a busca pode ser interrompida antecipadamente
+mantendo a melhor solução (`OptimizationQueue.stop`).
+"""
+# Imports de bibliotecas padrão
+import logging
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+# Imports do projeto
+from backend.controler import start_optimization, run_optimization, release_planning
+from backend.model import engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OptimizationJob:
+    """Uma otimização enfileirada ou em execução."""
+    planning_id: int
+    options: dict = field(default_factory=dict)
+    state: str = "queued"  # queued, running, done, failed, cancelled
+    process: mp.Process | None = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    progress: list[dict] = field(default_factory=list)  # objetivo e tempo de cada solução melhor
+    incumbent: dict | None = None  # última solução recebida do solver, com as rotas
+    stop_event: object = None
+    connection: object = None  # extremidade de leitura do canal de progresso
+
+
+def _worker(planning_id: int, options: dict, connection, stop_event):
+    """Ponto de entrada do processo de otimização."""
+    if hasattr(os, "setpgrp"):
+        # Grupo de processos próprio: ao abortar, os subprocessos do solver também são encerrados
+        os.setpgrp()
+    # Conexões herdadas do processo pai não podem ser reutilizadas após o fork
+    engine.dispose(close=False)
+
+    def on_solution(info: dict) -> bool:
+        connection.send(info)
+        return stop_event.is_set()
+
+    ok = run_optimization(planning_id, on_solution=on_solution, should_stop=stop_event.is_set, **options)
+    raise SystemExit(0 if ok else 1)
+
+
+class OptimizationQueue:
+    """
+    Fila de otimizações executadas em processos separados, com no máximo
+    `max_workers` processos simultâneos.
+    """
+
+    def __init__(self, max_workers: int | None = None, poll_interval: float = 0.5):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.version = 0  # incrementado sempre que um job termina (usado pela interface para atualizar)
+        self._jobs: dict[int, OptimizationJob] = {}
+        self._queue: deque[int] = deque()
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    def submit(self, planning_id: int, **options) -> bool:
+        """
+        Enfileira a otimização do planejamento. O planejamento passa imediatamente para
+        'optimizing'. As opções são repassadas a `run_optimization` (ex.: portfolio, engine).
+        Retorna False se o planejamento não puder ser otimizado.
+        """
+        with self._lock:
+            job = self._jobs.get(planning_id)
+            if job and job.state in ("queued", "running"):
+                logger.warning(f"Planejamento id={planning_id} já está na fila de otimização.")
+                return False
+            if not start_optimization(planning_id):
+                return False
+            self._jobs[planning_id] = OptimizationJob(planning_id, options)
+            self._queue.append(planning_id)
+            self._dispatch()
+            self._ensure_monitor()
+        logger.info(f"Planejamento id={planning_id} enfileirado para otimização.")
+        return True
+
+    def cancel(self, planning_id: int) -> bool:
+        """
+        Aborta a otimização do planejamento: remove-o da fila ou encerra o processo em
+        execução, e devolve o planejamento ao status anterior.
+        Retorna True se havia uma otimização a abortar.
+        """
+        process = None
+        with self._lock:
+            job = self._jobs.get(planning_id)
+            if not job or job.state not in ("queued", "running"):
+                return False
+            if job.state == "queued":
+                self._queue.remove(planning_id)
+            else:
+                process = job.process
+                job.connection.close()
+            job.state = "cancelled"
+            job.finished_at = time.time()
+            self.version += 1
+        # Fora do lock: encerrar o processo pode levar alguns segundos e não deve travar a fila
+        self._kill(process)
+        release_planning(planning_id)
+        logger.info(f"Otimização do planejamento id={planning_id} abortada.")
+        return True
+
+    def stop(self, planning_id: int) -> bool:
+        """
+        Pede ao solver que encerre a busca e grave a melhor solução encontrada até agora.
+        Retorna True se havia uma otimização em execução.
+        """
+        job = self._jobs.get(planning_id)
+        if not job or job.state != "running":
+            return False
+        job.stop_event.set()
+        logger.info(f"Parada antecipada solicitada para o planejamento id={planning_id}.")
+        return True
+
+    def status(self, planning_id: int) -> OptimizationJob | None:
+        """Retorna o job mais recente do planejamento, ou None se não houver."""
+        return self._jobs.get(planning_id)
+
+    def running(self) -> list[OptimizationJob]:
+        """Retorna os jobs enfileirados ou em execução."""
+        return [j for j in self._jobs.values() if j.state in ("queued", "running")]
+
+    @staticmethod
+    def _kill(process: mp.Process):
+        """Encerra o processo do job (e seus subprocessos, quando possível)."""
+        if process is None or not process.is_alive():
+            return
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except ProcessLookupError:
+            pass
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _dispatch(self):
+        """Inicia os jobs enfileirados enquanto houver processos livres. Chamar com o lock."""
+        active = sum(1 for j in self._jobs.values() if j.state == "running")
+        while self._queue and active < self.max_workers:
+            job = self._jobs[self._queue.popleft()]
+            # Um canal por job: se o processo for encerrado no meio de um envio, só ele é afetado
+            job.connection, child_connection = mp.Pipe(duplex=False)
+            job.stop_event = mp.Event()
+            # Não-daemon: o solver pode criar seus próprios processos (decomposição, portfólio)
+            job.process = mp.Process(target=_worker, daemon=False,
+                                     args=(job.planning_id, job.options, child_connection, job.stop_event))
+            job.process.start()
+            child_connection.close()
+            job.state = "running"
+            job.started_at = time.time()
+            active += 1
+
+    def _ensure_monitor(self):
+        """Inicia a thread que acompanha o término dos processos. Chamar com o lock."""
+        if self._monitor is None or not self._monitor.is_alive():
+            self._monitor = threading.Thread(target=self._watch, name="optimization-queue", daemon=True)
+            self._monitor.start()
+
+    @staticmethod
+    def _receive_progress(job: OptimizationJob):
+        """Lê as soluções enviadas pelo processo do job."""
+        try:
+            while job.connection.poll():
+                info = job.connection.recv()
+                job.incumbent = info
+                job.progress.append({"objective": info["objective"], "elapsed": info["elapsed"]})
+        except (EOFError, OSError):
+            pass
+
+    def _watch(self):
+        """Acompanha os processos em execução, registra o resultado e despacha os próximos jobs."""
+        while True:
+            time.sleep(self.poll_interval)
+            failed = []
+            with self._lock:
+                for job in self._jobs.values():
+                    if job.state != "running":
+                        continue
+                    self._receive_progress(job)
+                    if job.process.is_alive():
+                        continue
+                    job.process.join()
+                    job.connection.close()
+                    job.finished_at = time.time()
+                    job.state = "done" if job.process.exitcode == 0 else "failed"
+                    if job.state == "failed":
+                        failed.append(job.planning_id)
+                    self.version += 1
+                    logger.info(f"Otimização do planejamento id={job.planning_id} terminou: {job.state} "
+                                f"({job.finished_at - job.started_at:.1f}s).")
+                self._dispatch()
+                idle = not self.running()
+                if idle:
+                    self._monitor = None
+            for planning_id in failed:
+                # Se o processo morreu sem gravar o resultado, o planejamento ainda está em 'optimizing'
+                release_planning(planning_id)
+            if idle:
+                return
+
+
+# Fila compartilhada pelo servidor
+optimization_queue = OptimizationQueue()
@@ -0,0 +1,97 @@
+"""
+Migrações do esquema do banco de dados.
+
+A versão do esquema fica na tabela `schema_version` (uma linha por migração aplicada).
+`migrate` é chamada ao importar backend/model.py:
+    - banco novo (sem as tabelas do modelo): cria o esquema atual e registra a última versão;
+    - banco anterior ao controle de versões (ex.: um router.db antigo): aplica todas as migrações;
+    - demais bancos: aplica apenas as migrações com versão maior que a registrada.
+
+Para alterar o esquema, altere o modelo e acrescente uma migração ao final de MIGRATIONS,
+com a próxima versão. Cada migração roda na mesma transação que registra a sua versão.
+"""
+# Imports de bibliotecas padrão
+import logging
+from datetime import datetime, timezone
+
+# Imports de terceiros
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text
+
+logger = logging.getLogger(__name__)
+
+# Tabela de controle, fora do metadata do modelo (não é afetada por drop_all/create_all)
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime, default=lambda: datetime.now(timezone.utc)),
+)
+
+
+def _create_tables(connection, metadata):
+    """Cria as tabelas do modelo que ainda não existem."""
+    metadata.create_all(connection)
+
+
+def _create_indexes(*names: str):
+    """Migração que cria os índices do modelo com os nomes informados, se ainda não existirem."""
+    def upgrade(connection, metadata):
+        for table in metadata.tables.values():
+            for index in table.indexes:
+                if index.name in names:
+                    index.create(connection, checkfirst=True)
+    return upgrade
+
+
+def _add_columns(table_name: str, *names: str):
+    """Migração que acrescenta à tabela as colunas do modelo com os nomes informados, se ainda não existirem."""
+    def upgrade(connection, metadata):
+        existing = {column["name"] for column in inspect(connection).get_columns(table_name)}
+        table = metadata.tables[table_name]
+        for name in names:
+            if name not in existing:
+                column_type = table.c[name].type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+    return upgrade
+
+
+# (versão, descrição, função(connection, metadata))
+MIGRATIONS = [
+    (1, "Tabelas iniciais", _create_tables),
+    (2, "Índices dos filtros de pedidos, planejamentos e rotas", _create_indexes(
+        "ix_orders_status_planning_id", "ix_orders_planning_id", "ix_orders_route_id",
+        "ix_routes_planning_id", "ix_planning_status",
+    )),
+    (3, "Distância de cada pedido desde a parada anterior da rota", _add_columns("orders", "leg_distance")),
+]
+
+
+def current_version(connection) -> int | None:
+    """Versão atual do esquema, ou None se o banco não tiver controle de versões."""
+    if not inspect(connection).has_table(schema_version.name):
+        return None
+    return connection.scalar(select(func.max(schema_version.c.version)))
+
+
+def migrate(engine, metadata):
+    """Cria ou atualiza o esquema do banco para a última versão de MIGRATIONS."""
+    latest = MIGRATIONS[-1][0]
+    with engine.begin() as connection:
+        version = current_version(connection)
+        schema_version.create(connection, checkfirst=True)
+        if version is None:
+            existing = set(inspect(connection).get_table_names())
+            if not existing & set(metadata.tables):
+                # Banco novo: o modelo já descreve o esquema da última versão
+                metadata.create_all(connection)
+                connection.execute(insert(schema_version), {"version": latest, "description": "Esquema inicial"})
+                logger.info(f"Esquema do banco criado na versão {latest}.")
+                return
+            version = 0
+    for number, description, upgrade in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            upgrade(connection, metadata)
+            connection.execute(insert(schema_version), {"version": number, "description": description})
+        logger.info(f"Migração {number} aplicada: {description}.")
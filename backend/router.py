@@ -1,5 +1,12 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
+from sklearn.cluster import KMeans
 
 def create_sample_data():
     """Stores the data for the problem."""
@@ -32,8 +39,168 @@ def create_sample_data():
     return data
 
 
+def insert_unrouted(routes: list[list[int]], unrouted: list[int], distance_matrix,
+                    demands: list[int], vehicle_capacities: list[int], depot: int = 0):
+    """
+    Insere nós ainda não roteados nas rotas existentes pela inserção mais barata,
+    respeitando a capacidade de cada veículo.
+
+    Args:
+        routes: Lista, por veículo, dos nós visitados (sem o depósito). É alterada no lugar.
+        unrouted: Nós a inserir.
+        distance_matrix: Matriz de distâncias entre todos os locais.
+        demands: Lista de demandas para cada local (0 para o depósito).
+        vehicle_capacities: Lista de capacidades para cada veículo.
+        depot: Índice do nó que representa o depósito.
+
+    Returns:
+        Uma tupla (routes, leftover) com as rotas atualizadas e os nós que não couberam
+        em nenhum veículo.
+    """
+    loads = [sum(demands[node] for node in route) for route in routes]
+    leftover = []
+    # Insere primeiro os nós de maior demanda, que são os mais difíceis de acomodar
+    for node in sorted(unrouted, key=lambda n: -demands[n]):
+        best = None  # (custo, veículo, posição)
+        for vehicle_id, route in enumerate(routes):
+            if loads[vehicle_id] + demands[node] > vehicle_capacities[vehicle_id]:
+                continue
+            path = [depot] + route + [depot]
+            for pos in range(len(path) - 1):
+                a, b = path[pos], path[pos + 1]
+                delta = distance_matrix[a][node] + distance_matrix[node][b] - distance_matrix[a][b]
+                if best is None or delta < best[0]:
+                    best = (delta, vehicle_id, pos)
+        if best is None:
+            leftover.append(node)
+            continue
+        _, vehicle_id, pos = best
+        routes[vehicle_id].insert(pos, node)
+        loads[vehicle_id] += demands[node]
+    return routes, leftover
+
+
+# Perfis de parâmetros do solver, mesclados aos dados de entrada de `solve_vrp`
+SOLVER_PROFILES = {
+    # Construção inicial + busca local até o primeiro ótimo local
+    "default": {},
+    # Resposta rápida: limita a busca local a poucos segundos
+    "fast": {"time_limit": 5},
+    # Busca guiada (GLS) por até 30 segundos
+    "balanced": {"local_search_metaheuristic": "GUIDED_LOCAL_SEARCH", "time_limit": 30},
+    # Busca guiada (GLS) por até 2 minutos
+    "quality": {"local_search_metaheuristic": "GUIDED_LOCAL_SEARCH", "time_limit": 120},
+}
+
+# Custo usado no lugar de distâncias infinitas (locais sem caminho na malha viária)
+UNREACHABLE_COST = 10**9
+
+# Peso, no objetivo, de cada segundo da rota mais longa quando o makespan é minimizado
+# (`minimize_makespan`): 1 s da rota mais longa custa o mesmo que 100 m percorridos
+MAKESPAN_COEFFICIENT = 100
+
+# Penalidade padrão por nó não atendido quando o descarte de nós é permitido (`drop_penalty`).
+# Maior que qualquer desvio realista (em metros), para que o solver só descarte nós que
+# não possam ser atendidos, e menor que UNREACHABLE_COST, para que nós inalcançáveis sejam descartados.
+DROP_PENALTY = 10**8
+
+# Custo por km dos veículos sem custo cadastrado (Vehicles.cost_per_km é opcional)
+DEFAULT_COST_PER_KM = 1.0
+
+
+def unreachable_nodes(distance_matrix, depot: int = 0) -> list[int]:
+    """Nós sem caminho do depósito até eles ou deles de volta ao depósito."""
+    matrix = np.asarray(distance_matrix, dtype=float)
+    bad = ~np.isfinite(matrix[depot, :]) | ~np.isfinite(matrix[:, depot])
+    return [int(n) for n in np.flatnonzero(bad) if n != depot]
+
+
+def check_feasibility(input_data: dict) -> list[dict]:
+    """
+    Verificações rápidas (milissegundos) de que a instância pode ter solução, antes de executar o solver:
+        - order_exceeds_capacity: pedidos com demanda maior que a capacidade do maior veículo;
+        - total_demand_exceeds_capacity: demanda total maior que a capacidade total da frota;
+        - bin_packing_bound: pedidos grandes demais para dividir um veículo (demanda maior que
+          metade da maior capacidade) exigem um veículo cada, e não há veículos suficientes
+          que os comportem;
+        - unreachable: nós sem caminho de ida ou volta ao depósito (somente se
+          `distance_matrix` estiver em `input_data`);
+        - deadline: nós cuja ida e volta ao depósito, com o tempo de atendimento, já excede
+          `route_time_limit` (somente se `time_matrix` e `route_time_limit` estiverem em `input_data`).
+
+    Args:
+        input_data: O mesmo dicionário aceito por `solve_vrp` (demands, vehicle_capacities, depot
+            e, opcionalmente, distance_matrix).
+
+    Returns:
+        Lista de problemas encontrados (vazia se nenhum), cada um um dicionário com "reason"
+        (código acima), "message" (descrição) e "nodes" (nós envolvidos, quando aplicável).
+    """
+    demands = input_data["demands"]
+    depot = input_data["depot"]
+    capacities = sorted(input_data["vehicle_capacities"], reverse=True)
+    max_capacity = capacities[0] if capacities else 0
+    nodes = [n for n in range(len(demands)) if n != depot]
+    issues = []
+
+    oversized = [n for n in nodes if demands[n] > max_capacity]
+    if oversized:
+        issues.append({
+            "reason": "order_exceeds_capacity", "nodes": oversized,
+            "message": f"{len(oversized)} pedido(s) com demanda maior que a capacidade do maior veículo "
+                       f"({max_capacity}).",
+        })
+    fitting = [n for n in nodes if demands[n] <= max_capacity]
+    total_demand = sum(demands[n] for n in fitting)
+    if total_demand > sum(capacities):
+        issues.append({
+            "reason": "total_demand_exceeds_capacity", "nodes": [],
+            "message": f"Demanda total ({total_demand}) maior que a capacidade total da frota ({sum(capacities)}).",
+        })
+    # Dois pedidos com demanda maior que metade da maior capacidade nunca cabem no mesmo veículo:
+    # o i-ésimo maior deles precisa de um veículo com pelo menos a sua demanda (i-ésima maior capacidade)
+    large = sorted((n for n in fitting if 2 * demands[n] > max_capacity), key=lambda n: -demands[n])
+    unmatched = [n for i, n in enumerate(large) if i >= len(capacities) or demands[n] > capacities[i]]
+    if unmatched:
+        issues.append({
+            "reason": "bin_packing_bound", "nodes": large,
+            "message": f"{len(large)} pedido(s) grandes exigem um veículo cada, mas a frota não comporta "
+                       f"todos ao mesmo tempo ({len(capacities)} veículos).",
+        })
+    if input_data.get("time_matrix") is not None and input_data.get("route_time_limit"):
+        times = np.asarray(input_data["time_matrix"], dtype=float)
+        service = np.asarray(input_data.get("service_times") or [0] * len(demands), dtype=float)
+        round_trip = times[depot, :] + service + times[:, depot]
+        late = [n for n in nodes if round_trip[n] > input_data["route_time_limit"]]
+        if late:
+            issues.append({
+                "reason": "deadline", "nodes": late,
+                "message": f"{len(late)} parada(s) não podem ser atendidas dentro do prazo "
+                           f"({input_data['route_time_limit'] / 60:.0f} min), nem mesmo em uma rota exclusiva.",
+            })
+    if "distance_matrix" in input_data:
+        unreachable = unreachable_nodes(input_data["distance_matrix"], depot)
+        if unreachable:
+            issues.append({
+                "reason": "unreachable", "nodes": unreachable,
+                "message": f"{len(unreachable)} parada(s) sem caminho na malha viária a partir do depósito "
+                           f"ou de volta a ele.",
+            })
+    return issues
+
 
-def solve_vrp(input_data: dict) -> dict:
+def _integer_matrix(distance_matrix, scale: float = 1.0) -> list[list[int]]:
+    """
+    Converte a matriz de distâncias, multiplicada por `scale`, para inteiros (o OR-Tools só
+    trabalha com custos inteiros; custos em ponto flutuante são truncados pelo solver).
+    Distâncias infinitas viram UNREACHABLE_COST.
+    """
+    matrix = np.asarray(distance_matrix, dtype=float)
+    matrix = np.where(np.isfinite(matrix), np.rint(matrix * scale), UNREACHABLE_COST)
+    return matrix.astype(np.int64).tolist()
+
+
+def solve_vrp(input_data: dict, on_solution=None, should_stop=None) -> dict:
     """
     Resolve o Problema de Roteamento de Veículos (VRP) com restrições de capacidade.
 
@@ -44,16 +211,54 @@ def solve_vrp(input_data: dict) -> dict:
             - depot: Índice do nó que representa o depósito (ponto de partida e chegada).
             - demands: Lista de demandas para cada local (0 para o depósito).
             - vehicle_capacities: Lista de capacidades para cada veículo.
+            - vehicle_costs (opcional): Custo por km de cada veículo. Quando informado, o custo de
+              um arco para o veículo é a distância (m) × custo por km, e o solver minimiza o custo
+              da frota em vez da distância total. Custos None valem DEFAULT_COST_PER_KM.
+            - starts, ends (opcionais): Listas, por veículo, dos nós de partida e de chegada
+              (vários depósitos). Quando informadas, substituem `depot`; esses nós devem ter demanda 0.
+            - initial_routes (opcional): Lista, por veículo, dos nós visitados (sem o depósito).
+              Quando informada, a busca parte desta solução (warm start) em vez de construir
+              uma solução inicial do zero.
+            - time_limit (opcional): Tempo máximo de busca, em segundos.
+            - first_solution_strategy (opcional): Nome da estratégia inicial do OR-Tools
+              (ex.: "PATH_CHEAPEST_ARC", "SAVINGS"). Padrão: "PATH_CHEAPEST_ARC".
+            - local_search_metaheuristic (opcional): Nome da metaheurística de busca local
+              (ex.: "GUIDED_LOCAL_SEARCH"). Sem ela, a busca para no primeiro ótimo local.
+            - time_matrix (opcional): Matriz de tempos de viagem, em segundos. Quando informada,
+              o solver acompanha a duração de cada rota (dimensão "Time").
+            - service_times (opcional): Tempo de atendimento de cada nó, em segundos (0 no depósito).
+            - route_time_limit (opcional): Duração máxima de cada rota, em segundos, da saída
+              à volta ao depósito (ex.: tempo até o prazo do planejamento). Requer time_matrix.
+            - minimize_makespan (opcional): Se True, minimiza também a duração da rota mais
+              longa (ver MAKESPAN_COEFFICIENT). Requer time_matrix.
+            - drop_penalty (opcional): Permite deixar nós sem atendimento, ao custo desta
+              penalidade por nó (ver DROP_PENALTY). Sem ela, todos os nós são obrigatórios.
+        on_solution: Função opcional chamada a cada solução melhor encontrada durante a busca,
+            com um dicionário contendo "objective", "cost" (custo dos arcos percorridos: o custo da
+            frota com vehicle_costs, ou a distância total; sem penalidades de descarte nem de makespan),
+            "elapsed" (segundos desde o início) e "routes" (lista, por veículo, dos nós visitados,
+            com o depósito nas pontas).
+            Se ela retornar True, a busca é encerrada e a melhor solução até então é retornada.
+        should_stop: Função opcional sem argumentos consultada a cada solução encontrada
+            (melhor ou não). Se ela retornar True, a busca é encerrada e a melhor solução
+            até então é retornada.
 
     Returns:
         Um dicionário contendo a solução encontrada:
-            - objective: O custo total da solução (distância total percorrida por todos os veículos).
-            - routes: Um dicionário mapeando o ID de cada veículo para sua rota e distância.
+            - objective: O custo total da solução (distância total percorrida por todos os veículos ou,
+              com vehicle_costs, a soma de distância × custo por km, em milésimos da unidade monetária).
+            - routes: Um dicionário mapeando o ID de cada veículo para sua rota, distância e
+              distância de cada arco da rota ("legs").
             - max_route_distance: A distância máxima percorrida por um único veículo.
+            - dropped: Nós não atendidos (somente com drop_penalty).
+            - max_route_time: A duração da rota mais longa, em segundos (somente com time_matrix);
+              cada rota traz também a sua duração ("time").
         Ou um dicionário com uma chave "error" se nenhuma solução for encontrada.
     """
     # Configuração do modelo usando input_data
     data = input_data
+    # Matriz de custos inteiros consultada pelas callbacks
+    distance_matrix = _integer_matrix(data["distance_matrix"])
     # 1. Gerenciador de Índices de Roteamento (Routing Index Manager):
     # Cria um mapeamento entre os índices internos do solver (0 a N-1) e os nós do problema
     # (índices da matriz de distância, 0 a M-1). Isso é necessário porque o solver
@@ -62,9 +267,17 @@ def solve_vrp(input_data: dict) -> dict:
     # - len(data["distance_matrix"]): Número total de locais (nós) no problema.
     # - data["num_vehicles"]: Número de veículos (rotas) a serem planejadas.
     # - data["depot"]: O índice do nó que serve como depósito inicial e final para todas as rotas.
-    manager = pywrapcp.RoutingIndexManager(
-        len(data["distance_matrix"]), data["num_vehicles"], data["depot"]
-    )
+    if data.get("starts"):
+        # Vários depósitos: cada veículo parte do nó starts[v] e termina em ends[v]
+        manager = pywrapcp.RoutingIndexManager(
+            len(data["distance_matrix"]), data["num_vehicles"], list(data["starts"]), list(data["ends"])
+        )
+        depots = set(data["starts"]) | set(data["ends"])
+    else:
+        manager = pywrapcp.RoutingIndexManager(
+            len(data["distance_matrix"]), data["num_vehicles"], data["depot"]
+        )
+        depots = {data["depot"]}
     # 2. Modelo de Roteamento (Routing Model):
     # Cria o modelo principal do problema de roteamento, usando o gerenciador de índices.
     # Este objeto conterá todas as variáveis, restrições e o objetivo do problema.
@@ -79,15 +292,33 @@ def solve_vrp(input_data: dict) -> dict:
         from_node = manager.IndexToNode(from_index)
         to_node = manager.IndexToNode(to_index)
         # Retorna a distância da matriz de distâncias pré-calculada.
-        return data["distance_matrix"][from_node][to_node]
+        return distance_matrix[from_node][to_node]
+
+    if data.get("vehicle_costs"):
+        # Custo por veículo: distância × custo por km. Uma matriz e uma callback por custo
+        # distinto (e não por veículo), pois a frota costuma ter poucos modelos.
+        vehicles_by_cost = {}
+        for vehicle_id, cost in enumerate(data["vehicle_costs"]):
+            cost = DEFAULT_COST_PER_KM if cost is None else float(cost)
+            vehicles_by_cost.setdefault(cost, []).append(vehicle_id)
+        for cost, vehicle_ids in vehicles_by_cost.items():
+            cost_matrix = _integer_matrix(data["distance_matrix"], scale=cost)
 
-    # Registra a função de callback de distância no modelo.
-    # O solver usará esta função para calcular os custos de transição (arcos).
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-    # Define o custo de cada arco (trecho entre locais) para todos os veículos.
-    # Informa ao solver para usar a 'distance_callback' para determinar o custo de viajar
-    # entre quaisquer dois pontos em uma rota.
-    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+            def cost_callback(from_index, to_index, cost_matrix=cost_matrix):
+                """Retorna o custo do arco entre dois nós para os veículos deste custo por km."""
+                return cost_matrix[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+
+            cost_callback_index = routing.RegisterTransitCallback(cost_callback)
+            for vehicle_id in vehicle_ids:
+                routing.SetArcCostEvaluatorOfVehicle(cost_callback_index, vehicle_id)
+    else:
+        # Registra a função de callback de distância no modelo.
+        # O solver usará esta função para calcular os custos de transição (arcos).
+        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # Define o custo de cada arco (trecho entre locais) para todos os veículos.
+        # Informa ao solver para usar a 'distance_callback' para determinar o custo de viajar
+        # entre quaisquer dois pontos em uma rota.
+        routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
     # 4. Função Callback para Demandas (Restrição de Capacidade):
     # Define como obter a demanda de um local específico.
@@ -111,14 +342,46 @@ def solve_vrp(input_data: dict) -> dict:
         "Capacity",             # Nome da dimensão (usado para depuração e identificação).
     )
 
+    # Dimensão de tempo (opcional): duração acumulada de cada rota, com viagens e atendimentos
+    time_dimension = None
+    if data.get("time_matrix") is not None:
+        time_matrix = _integer_matrix(data["time_matrix"])
+        service_times = [int(round(t)) for t in (data.get("service_times") or [0] * len(time_matrix))]
+
+        def time_callback(from_index, to_index):
+            """Retorna o tempo de atendimento no nó de origem mais o tempo de viagem até o destino."""
+            from_node = manager.IndexToNode(from_index)
+            to_node = manager.IndexToNode(to_index)
+            return time_matrix[from_node][to_node] + service_times[from_node]
+
+        time_callback_index = routing.RegisterTransitCallback(time_callback)
+        routing.AddDimension(
+            time_callback_index,
+            0,                                                    # Sem espera nos nós
+            int(data.get("route_time_limit") or UNREACHABLE_COST),  # Duração máxima de cada rota
+            True,                                                 # Rotas começam no instante 0
+            "Time",
+        )
+        time_dimension = routing.GetDimensionOrDie("Time")
+        if data.get("minimize_makespan"):
+            # Penaliza a maior duração entre todas as rotas (makespan)
+            time_dimension.SetGlobalSpanCostCoefficient(MAKESPAN_COEFFICIENT)
+
+    # Nós opcionais: cada nó pode ficar fora das rotas, pagando a penalidade (disjunção)
+    if data.get("drop_penalty"):
+        for node in range(len(data["distance_matrix"])):
+            if node not in depots:
+                routing.AddDisjunction([manager.NodeToIndex(node)], int(data["drop_penalty"]))
+
     # 5. Configuração dos Parâmetros de Busca:
     # Define a estratégia que o solver usará para encontrar a primeira solução.
     # PATH_CHEAPEST_ARC: Uma heurística comum que constrói rotas adicionando iterativamente
     # o arco (trecho) mais barato disponível que conecta um nó não visitado a uma rota existente,
     # respeitando as restrições.
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-    search_parameters.first_solution_strategy = (
-        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy,
+        data.get("first_solution_strategy", "PATH_CHEAPEST_ARC")
     )
     # Outras opções de estratégia e parâmetros de busca podem ser configuradas aqui
     # para melhorar a qualidade da solução ou o tempo de execução (ex: metaheurísticas como
@@ -126,10 +389,54 @@ def solve_vrp(input_data: dict) -> dict:
     # search_parameters.local_search_metaheuristic = (
     #     routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
     # search_parameters.time_limit.seconds = 30
+    if data.get("local_search_metaheuristic"):
+        search_parameters.local_search_metaheuristic = getattr(
+            routing_enums_pb2.LocalSearchMetaheuristic, data["local_search_metaheuristic"]
+        )
+    if data.get("time_limit"):
+        search_parameters.time_limit.FromMilliseconds(int(data["time_limit"] * 1000))
+
+    # Acompanhamento da busca: atende pedidos de parada e reporta cada solução melhor encontrada (incumbente)
+    if on_solution is not None or should_stop is not None:
+        start_time = time.time()
+        best_objective = [None]
+
+        def solution_callback():
+            # A parada é verificada em toda solução, mesmo quando a busca não melhora o incumbente
+            if should_stop is not None and should_stop():
+                routing.solver().FinishCurrentSearch()
+                return
+            objective = routing.CostVar().Max()
+            if on_solution is None or (best_objective[0] is not None and objective >= best_objective[0]):
+                return
+            best_objective[0] = objective
+            routes = []
+            cost = 0
+            for vehicle_id in range(data["num_vehicles"]):
+                index = routing.Start(vehicle_id)
+                route = [manager.IndexToNode(index)]
+                while not routing.IsEnd(index):
+                    previous_index, index = index, routing.NextVar(index).Value()
+                    cost += routing.GetArcCostForVehicle(previous_index, index, vehicle_id)
+                    route.append(manager.IndexToNode(index))
+                routes.append(route)
+            stop = on_solution({"objective": objective, "cost": cost, "elapsed": time.time() - start_time,
+                                "routes": routes})
+            if stop:
+                routing.solver().FinishCurrentSearch()
+
+        routing.AddAtSolutionCallback(solution_callback)
 
     # 6. Resolução do Problema:
-    # Executa o solver com os parâmetros definidos para encontrar uma solução.
-    solution = routing.SolveWithParameters(search_parameters)
+    # Se houver rotas iniciais (ex.: re-otimização de um planejamento já roteirizado),
+    # a busca local parte delas; caso contrário, executa o solver do zero.
+    solution = None
+    if data.get("initial_routes"):
+        initial_solution = routing.ReadAssignmentFromRoutes(data["initial_routes"], True)
+        if initial_solution:
+            solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+    if solution is None:
+        solution = routing.SolveWithParameters(search_parameters)
 
     # 7. Processamento e Retorno da Solução:
     result = {}
@@ -146,6 +453,7 @@ def solve_vrp(input_data: dict) -> dict:
             index = routing.Start(vehicle_id) # Obtém o índice do nó inicial para este veículo.
             route = []
             route_distance = 0
+            legs = []
             # Percorre a rota do veículo nó por nó até retornar ao depósito.
             while not routing.IsEnd(index):
                 node_index = manager.IndexToNode(index) # Converte o índice do solver para o nó original.
@@ -155,13 +463,17 @@ def solve_vrp(input_data: dict) -> dict:
                 # Calcula a distância do arco entre o nó anterior e o nó atual usando a callback.
                 arc_distance = distance_callback(previous_index, index)
                 route_distance += arc_distance
+                legs.append(arc_distance)
 
             # Adiciona o último nó (depósito) à rota visual.
             node_index = manager.IndexToNode(index)
             route.append(node_index)
 
             # Armazena a rota e a distância calculada para este veículo.
-            routes[vehicle_id] = {"route": route, "distance": route_distance}
+            routes[vehicle_id] = {"route": route, "distance": route_distance, "legs": legs}
+            if time_dimension is not None:
+                # Duração da rota: instante de chegada ao depósito final
+                routes[vehicle_id]["time"] = solution.Min(time_dimension.CumulVar(index))
             # Atualiza a distância máxima encontrada entre todas as rotas.
             max_route_distance = max(max_route_distance, route_distance)
             # Acumula a distância desta rota na distância total manual.
@@ -177,12 +489,241 @@ def solve_vrp(input_data: dict) -> dict:
 
         result["routes"] = routes
         result["max_route_distance"] = max_route_distance
+        if time_dimension is not None:
+            result["max_route_time"] = max((r["time"] for r in routes.values()), default=0)
+        if data.get("drop_penalty"):
+            visited = {node for info in routes.values() for node in info["route"]}
+            result["dropped"] = [n for n in range(len(data["distance_matrix"])) if n not in visited]
+            # O objetivo informado é a distância total, sem as penalidades
+            result["objective"] -= int(data["drop_penalty"]) * len(result["dropped"])
     else:
         # Se nenhuma solução foi encontrada, retorna uma mensagem de erro.
         result["error"] = "No solution found"
     return result
 
 
+def _balanced_clusters(coords, demands: list[int], num_clusters: int, slack: float = 0.1,
+                       random_state: int = 0) -> list[list[int]]:
+    """
+    Particiona os nós (exceto o depósito, nó 0) em clusters geográficos com demanda equilibrada.
+    Os centróides vêm do KMeans; em seguida cada nó é atribuído ao centróide mais próximo que
+    ainda tenha folga de demanda, priorizando os nós com maior arrependimento (regret).
+    """
+    points = np.asarray(coords[1:], dtype=float)
+    node_demands = np.asarray(demands[1:], dtype=float)
+    kmeans = KMeans(n_clusters=num_clusters, n_init=10, random_state=random_state).fit(points)
+    dist = np.linalg.norm(points[:, None, :] - kmeans.cluster_centers_[None, :, :], axis=2)
+    limit = node_demands.sum() / num_clusters * (1 + slack)
+    ranked = np.argsort(dist, axis=1)
+    # Regret: diferença entre o segundo e o primeiro centróide mais próximos
+    sorted_dist = np.take_along_axis(dist, ranked, axis=1)
+    regret = sorted_dist[:, 1] - sorted_dist[:, 0] if num_clusters > 1 else np.zeros(len(points))
+    loads = np.zeros(num_clusters)
+    clusters = [[] for _ in range(num_clusters)]
+    for i in np.argsort(-regret):
+        # Se nenhum cluster tiver folga, usa o de menor carga
+        target = next((c for c in ranked[i] if loads[c] + node_demands[i] <= limit), int(np.argmin(loads)))
+        clusters[target].append(int(i) + 1)
+        loads[target] += node_demands[i]
+    return [c for c in clusters if c]
+
+
+def _allocate_vehicles(clusters: list[list[int]], demands: list[int],
+                       vehicle_capacities: list[int]) -> list[list[int]]:
+    """
+    Distribui os veículos entre os clusters: cada cluster recebe ao menos um veículo e os demais
+    (do maior para o menor) vão para o cluster com maior déficit de capacidade.
+    """
+    deficits = [sum(demands[node] for node in cluster) for cluster in clusters]
+    allocation = [[] for _ in clusters]
+    for vehicle_id in sorted(range(len(vehicle_capacities)), key=lambda v: -vehicle_capacities[v]):
+        empty = [c for c in range(len(clusters)) if not allocation[c]]
+        target = max(empty or range(len(clusters)), key=lambda c: deficits[c])
+        allocation[target].append(vehicle_id)
+        deficits[target] -= vehicle_capacities[vehicle_id]
+    return allocation
+
+
+def solve_vrp_decomposed(input_data: dict, max_cluster_size: int = 200, workers: int | None = None,
+                         improvement_time_limit: float = 30, on_solution=None, should_stop=None,
+                         matrix_builder=None) -> dict:
+    """
+    Resolve instâncias grandes por decomposição (cluster-first, route-second).
+
+    Os pedidos são agrupados em clusters geográficos de demanda equilibrada, cada cluster recebe
+    uma parte da frota e os subproblemas são resolvidos em paralelo (processos), com os mesmos
+    parâmetros de busca (perfil) do problema completo. Se a matriz completa for informada, a
+    solução combinada é usada como ponto de partida de uma busca local no problema completo,
+    que permite trocas entre clusters; essa matriz pode ser aproximada (ex.: a matriz esparsa de
+    `Graph.node_sparse_distance_matrix`) quando `matrix_builder` calcula as matrizes dos clusters.
+    Instâncias que cabem em um único cluster são resolvidas diretamente, sem decomposição.
+
+    Args:
+        input_data: O mesmo dicionário aceito por `solve_vrp`, acrescido de:
+            - coordinates: Lista de (latitude, longitude) de cada nó, na ordem da matriz.
+            A chave distance_matrix é opcional quando `matrix_builder` é informado.
+        max_cluster_size: Número máximo aproximado de pedidos por cluster.
+        workers: Número de processos (None usa o número de CPUs).
+        improvement_time_limit: Tempo máximo, em segundos, da busca local entre clusters.
+        on_solution, should_stop: Repassadas a `solve_vrp` na busca local entre clusters.
+        matrix_builder: Função opcional que recebe uma lista de nós (o depósito primeiro) e
+            retorna a matriz de distâncias entre eles. Se informada, cada cluster tem a sua
+            própria matriz (a memória e o tempo de cálculo crescem com o tamanho dos clusters,
+            não da instância) e a matriz completa, se houver, é usada apenas na busca local
+            entre clusters; sem a matriz completa, não há busca local entre clusters.
+
+    Returns:
+        Um dicionário no mesmo formato retornado por `solve_vrp`.
+    """
+    data = input_data
+    distance_matrix = data.get("distance_matrix")
+    if distance_matrix is not None:
+        distance_matrix = np.asarray(distance_matrix)
+    elif matrix_builder is None:
+        raise ValueError("A decomposição exige distance_matrix ou matrix_builder.")
+    depot = data["depot"]
+    demands = data["demands"]
+    capacities = data["vehicle_capacities"]
+    num_nodes = len(demands)
+    if depot != 0:
+        raise ValueError("A decomposição assume o depósito no nó 0.")
+
+    num_clusters = min(max(1, math.ceil((num_nodes - 1) / max_cluster_size)), data["num_vehicles"])
+    if num_clusters == 1:
+        # Um único cluster: a decomposição só pioraria a solução
+        if matrix_builder is not None:
+            distance_matrix = matrix_builder(list(range(num_nodes)))
+        single = {k: v for k, v in data.items() if k != "coordinates"}
+        return solve_vrp({**single, "distance_matrix": distance_matrix},
+                         on_solution=on_solution, should_stop=should_stop)
+    clusters = _balanced_clusters(data["coordinates"], demands, num_clusters)
+    allocation = _allocate_vehicles(clusters, demands, capacities)
+
+    # Subproblemas: o nó 0 é sempre o depósito, seguido dos nós do cluster
+    search = {k: data[k] for k in ("time_limit", "first_solution_strategy", "local_search_metaheuristic")
+              if k in data}
+    sub_inputs = []
+    for cluster, vehicle_ids in zip(clusters, allocation):
+        nodes = [depot] + cluster
+        sub_inputs.append({
+            "distance_matrix": (matrix_builder(nodes) if matrix_builder is not None
+                                else distance_matrix[np.ix_(nodes, nodes)]),
+            "num_vehicles": len(vehicle_ids),
+            "depot": 0,
+            "demands": [demands[node] for node in nodes],
+            "vehicle_capacities": [capacities[v] for v in vehicle_ids],
+            **search,
+        })
+        if data.get("vehicle_costs"):
+            sub_inputs[-1]["vehicle_costs"] = [data["vehicle_costs"][v] for v in vehicle_ids]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        sub_results = list(executor.map(solve_vrp, sub_inputs))
+
+    initial_routes = [[] for _ in range(data["num_vehicles"])]
+    routes = {vehicle_id: {"route": [depot, depot], "distance": 0.0, "legs": [0.0]}
+              for vehicle_id in range(data["num_vehicles"])}
+    for cluster, vehicle_ids, sub_result in zip(clusters, allocation, sub_results):
+        if "error" in sub_result:
+            return {"error": f"No solution found for a cluster ({len(cluster)} nodes)"}
+        nodes = [depot] + cluster
+        for sub_vehicle, route_info in sub_result["routes"].items():
+            vehicle_id = vehicle_ids[sub_vehicle]
+            initial_routes[vehicle_id] = [nodes[n] for n in route_info["route"][1:-1]]
+            routes[vehicle_id] = {"route": [depot] + initial_routes[vehicle_id] + [depot],
+                                  "distance": route_info["distance"], "legs": route_info["legs"]}
+
+    if distance_matrix is not None:
+        # Melhoria entre clusters: busca local no problema completo a partir da solução combinada
+        improved = solve_vrp({**data, "initial_routes": initial_routes, "time_limit": improvement_time_limit},
+                             on_solution=on_solution, should_stop=should_stop)
+        if "error" not in improved:
+            return improved
+
+    # Objetivo da solução combinada, na mesma escala do solver (custo da frota ou distância total)
+    costs = [1.0] * data["num_vehicles"]
+    if data.get("vehicle_costs"):
+        costs = [DEFAULT_COST_PER_KM if c is None else float(c) for c in data["vehicle_costs"]]
+    return {
+        "objective": int(round(sum(r["distance"] * costs[v] for v, r in routes.items()))),
+        "routes": routes,
+        "max_route_distance": max((r["distance"] for r in routes.values()), default=0),
+    }
+
+
+# Combinações (estratégia inicial, metaheurística) executadas pelo modo portfólio.
+# Ajuste esta lista conforme o relatório `portfolio` das execuções reais.
+DEFAULT_PORTFOLIO = [
+    ("PATH_CHEAPEST_ARC", "GUIDED_LOCAL_SEARCH"),
+    ("SAVINGS", "GUIDED_LOCAL_SEARCH"),
+    ("PARALLEL_CHEAPEST_INSERTION", "GUIDED_LOCAL_SEARCH"),
+    ("PATH_CHEAPEST_ARC", "SIMULATED_ANNEALING"),
+    ("CHRISTOFIDES", "TABU_SEARCH"),
+]
+
+
+def _solve_until(input_data: dict, deadline: float, slot: float) -> tuple[dict, float]:
+    """
+    Executa `solve_vrp` por até `slot` segundos, sem ultrapassar `deadline` (epoch, em segundos).
+    Retorna a solução e o tempo gasto.
+    """
+    start = time.time()
+    remaining = min(slot, deadline - start)
+    if remaining <= 0:
+        return {"error": "Deadline reached before start"}, 0.0
+    result = solve_vrp({**input_data, "time_limit": remaining})
+    return result, time.time() - start
+
+
+def solve_vrp_portfolio(input_data: dict, portfolio: list[tuple[str, str]] | None = None,
+                        time_limit: float = 30, workers: int | None = None) -> dict:
+    """
+    Resolve o VRP com várias combinações de estratégia inicial e metaheurística em paralelo
+    (processos), sob um prazo comum, e retorna a melhor solução. Se houver mais combinações
+    do que processos, cada execução recebe uma fatia do prazo.
+
+    Args:
+        input_data: O mesmo dicionário aceito por `solve_vrp`.
+        portfolio: Lista de pares (first_solution_strategy, local_search_metaheuristic).
+                   Padrão: DEFAULT_PORTFOLIO.
+        time_limit: Prazo total, em segundos, compartilhado por todas as execuções.
+        workers: Número de processos (None usa o número de CPUs).
+
+    Returns:
+        Um dicionário no mesmo formato retornado por `solve_vrp`, acrescido de:
+            - portfolio: Lista com estratégia, metaheurística, objetivo e tempo de cada execução.
+    """
+    portfolio = portfolio or DEFAULT_PORTFOLIO
+    workers = workers or os.cpu_count() or 1
+    deadline = time.time() + time_limit
+    # Com mais combinações do que processos, o prazo é dividido em rodadas
+    slot = time_limit / math.ceil(len(portfolio) / workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_solve_until, {**input_data,
+                                           "first_solution_strategy": strategy,
+                                           "local_search_metaheuristic": metaheuristic}, deadline, slot)
+            for strategy, metaheuristic in portfolio
+        ]
+        outcomes = [f.result() for f in futures]
+
+    best = None
+    report = []
+    for (strategy, metaheuristic), (result, elapsed) in zip(portfolio, outcomes):
+        report.append({
+            "first_solution_strategy": strategy,
+            "local_search_metaheuristic": metaheuristic,
+            "objective": result.get("objective"),
+            "time": elapsed,
+            "error": result.get("error"),
+        })
+        if "error" not in result and (best is None or result["objective"] < best["objective"]):
+            best = result
+    if best is None:
+        best = {"error": "No solution found"}
+    best["portfolio"] = report
+    return best
+
+
 if __name__ == "__main__":
     # Exemplo de utilização da função solve_vrp
     data_model = create_sample_data()
@@ -0,0 +1,204 @@
+"""
+Execução do solver em um subprocesso isolado.
+
+`solve_vrp_isolated` executa `solve_vrp` (backend/router.py) em um processo dedicado, que
+recebe as matrizes (distâncias e, se houver, tempos de viagem) por memória compartilhada,
+sem serializar listas. O processo chamador apenas acompanha o subprocesso: impõe um prazo de relógio rígido e um limite de
+memória residente (RSS) e, se precisar encerrá-lo, devolve a melhor solução recebida até então.
+Assim, uma instância patológica não trava nem esgota a memória do processo que chamou o solver.
+"""
+# Imports de bibliotecas padrão
+import logging
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+# Imports de terceiros
+import numpy as np
+
+# Imports do projeto
+from backend.router import solve_vrp, DEFAULT_COST_PER_KM
+
+logger = logging.getLogger(__name__)
+
+# Intervalo, em segundos, entre as verificações de prazo e memória do subprocesso
+POLL_INTERVAL = 0.1
+# Tempo dado ao solver, além do seu time_limit, antes de ser encerrado à força
+DEADLINE_MARGIN = 2.0
+# Chaves de `input_data` enviadas ao subprocesso por memória compartilhada
+MATRIX_KEYS = ("distance_matrix", "time_matrix")
+
+
+def _rss_mb(pid: int) -> float:
+    """Memória residente (RSS) atual do processo, em MB (0 se indisponível)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _child(shared: dict, input_data: dict, connection, stop_event):
+    """
+    Ponto de entrada do subprocesso: resolve e envia incumbentes e o resultado pelo canal.
+    `shared` mapeia cada chave de matriz para (nome da memória compartilhada, formato).
+    """
+    blocks = {key: shared_memory.SharedMemory(name=name) for key, (name, _) in shared.items()}
+    try:
+        matrices = {key: np.ndarray(shape, dtype=np.float64, buffer=blocks[key].buf)
+                    for key, (_, shape) in shared.items()}
+
+        def on_solution(info: dict) -> bool:
+            connection.send(("solution", info))
+            return stop_event.is_set()
+
+        result = solve_vrp({**input_data, **matrices}, on_solution=on_solution, should_stop=stop_event.is_set)
+        del matrices
+        connection.send(("result", result))
+    finally:
+        for shm in blocks.values():
+            shm.close()
+        connection.close()
+
+
+def _result_from_incumbent(incumbent: dict, input_data: dict) -> dict:
+    """
+    Monta um resultado no formato de `solve_vrp` a partir da última solução recebida: o objetivo
+    (custo da frota ou distância total, sem penalidades), os nós descartados e as durações das
+    rotas são recalculados a partir das rotas, como `solve_vrp` os informaria.
+    """
+    distance_matrix = np.asarray(input_data["distance_matrix"], dtype=np.float64)
+    costs = [1.0] * len(incumbent["routes"])
+    if input_data.get("vehicle_costs"):
+        costs = [DEFAULT_COST_PER_KM if c is None else float(c) for c in input_data["vehicle_costs"]]
+    time_matrix = input_data.get("time_matrix")
+    service_times = input_data.get("service_times") or [0] * len(distance_matrix)
+    routes = {}
+    for vehicle_id, route in enumerate(incumbent["routes"]):
+        legs = [float(np.rint(distance_matrix[a][b])) for a, b in zip(route, route[1:])]
+        routes[vehicle_id] = {"route": route, "distance": sum(legs), "legs": legs}
+        if time_matrix is not None:
+            routes[vehicle_id]["time"] = float(sum(np.rint(time_matrix[a][b]) + service_times[a]
+                                                   for a, b in zip(route, route[1:])))
+    distances = [r["distance"] for r in routes.values()]
+    result = {
+        "objective": int(round(sum(r["distance"] * costs[v] for v, r in routes.items()))),
+        "routes": routes,
+        "max_route_distance": max(distances, default=0),
+    }
+    if time_matrix is not None:
+        result["max_route_time"] = max((r["time"] for r in routes.values()), default=0)
+    if input_data.get("drop_penalty"):
+        visited = {node for route in incumbent["routes"] for node in route}
+        result["dropped"] = [n for n in range(len(distance_matrix)) if n not in visited]
+    return result
+
+
+def solve_vrp_isolated(input_data: dict, deadline: float | None = None, max_rss_mb: float | None = None,
+                       on_solution=None, should_stop=None) -> dict:
+    """
+    Executa `solve_vrp` em um subprocesso isolado.
+
+    Args:
+        input_data: O mesmo dicionário aceito por `solve_vrp`.
+        deadline: Prazo rígido, em segundos. Ao ser atingido, o subprocesso é encerrado.
+            Se `input_data` não tiver time_limit, o solver recebe o prazo menos DEADLINE_MARGIN,
+            para normalmente terminar sozinho.
+        max_rss_mb: Limite de memória residente do subprocesso, em MB. Se ultrapassado,
+            o subprocesso é encerrado.
+        on_solution: Chamada no processo atual a cada solução melhor encontrada (ver `solve_vrp`).
+            Se retornar True, o solver encerra a busca e devolve a melhor solução.
+        should_stop: Consultada no processo atual a cada POLL_INTERVAL, mesmo sem novas soluções.
+            Se retornar True, o solver encerra a busca e devolve a melhor solução.
+
+    Returns:
+        O resultado de `solve_vrp`. Se o subprocesso for encerrado (prazo ou memória), a melhor
+        solução recebida até então, com a chave "terminated" ("deadline" ou "memory"); sem
+        nenhuma solução, um dicionário com "error" e "terminated".
+    """
+    data = {k: v for k, v in input_data.items() if k not in MATRIX_KEYS}
+    if deadline is not None and not data.get("time_limit"):
+        data["time_limit"] = max(deadline - DEADLINE_MARGIN, 1)
+
+    blocks, shared = [], {}
+    try:
+        for key in MATRIX_KEYS:
+            if input_data.get(key) is None:
+                continue
+            values = np.asarray(input_data[key], dtype=np.float64)
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            blocks.append(shm)
+            np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+            shared[key] = (shm.name, values.shape)
+        connection, child_connection = mp.Pipe(duplex=False)
+        stop_event = mp.Event()
+        process = mp.Process(target=_child, daemon=True,
+                             args=(shared, data, child_connection, stop_event))
+        process.start()
+        child_connection.close()
+
+        started = time.time()
+        incumbent, result, terminated = None, None, None
+        while result is None and terminated is None:
+            if should_stop is not None and not stop_event.is_set() and should_stop():
+                # Repassa o pedido de parada mesmo que nenhuma solução nova tenha chegado
+                stop_event.set()
+            try:
+                # Lê as mensagens disponíveis (no máximo por POLL_INTERVAL): um fluxo contínuo de
+                # incumbentes não pode impedir as verificações de prazo, memória e processo abaixo
+                pass_started = time.time()
+                ready = connection.poll(POLL_INTERVAL)
+                while ready and result is None:
+                    kind, payload = connection.recv()
+                    if kind == "result":
+                        result = payload
+                    else:
+                        incumbent = payload
+                        if on_solution is not None and on_solution(payload):
+                            stop_event.set()
+                    ready = time.time() - pass_started < POLL_INTERVAL and connection.poll(0)
+            except EOFError:
+                # O subprocesso terminou sem enviar o resultado (ex.: morto pelo sistema)
+                terminated = "crashed"
+                break
+            if result is not None:
+                break
+            if deadline is not None and time.time() - started > deadline:
+                terminated = "deadline"
+            elif max_rss_mb is not None and _rss_mb(process.pid) > max_rss_mb:
+                terminated = "memory"
+            elif not process.is_alive() and not connection.poll():
+                terminated = "crashed"
+
+        if terminated is not None:
+            process.kill()
+            logger.warning(f"Solver encerrado ({terminated}) após {time.time() - started:.1f}s; "
+                           f"{'usando a melhor solução recebida' if incumbent else 'sem solução'}.")
+        process.join()
+        connection.close()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    if result is not None:
+        return result
+    if incumbent is None:
+        return {"error": "No solution found", "terminated": terminated}
+    return {**_result_from_incumbent(incumbent, input_data), "terminated": terminated}
+
+
+if __name__ == "__main__":
+    # Exemplo de utilização com os dados de exemplo do roteirizador
+    from backend.router import create_sample_data
+    result = solve_vrp_isolated(create_sample_data(), deadline=10, max_rss_mb=1024)
+    if "error" not in result:
+        print("Objective:", result["objective"])
+        for vehicle, route_info in result["routes"].items():
+            print(f"Veículo {vehicle}: Rota: {route_info['route']} - Distância: {route_info['distance']}m")
+    else:
+        print(result["error"])
@@ -0,0 +1,197 @@
+"""
+Gerador de carga sintética para testes de desempenho e escala.
+
+Insere em lote depósitos, veículos, dezenas de milhares de clientes (com coordenadas
+sorteadas sobre a malha viária), pedidos com demandas sorteadas de uma distribuição e
+planejamentos pendentes com parte desses pedidos. O mesmo `seed` gera sempre o mesmo
+conjunto de dados (exceto os prazos, opcionais, que são relativos ao momento da geração);
+os e-mails e placas carregam o seed, de modo que conjuntos com seeds diferentes podem
+coexistir no mesmo banco.
+
+Uso:
+    python -m backend.workload --customers 20000 --orders 50000 --seed 42
+"""
+# Imports de bibliotecas padrão
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+# Imports de terceiros
+import numpy as np
+from sqlalchemy import insert, select
+
+# Imports do projeto
+from backend.model import (
+    Session, Depots, Costumers, Vehicles, Orders, Planning, OrderStatus, PlanningStatus
+)
+from backend.graph import graph
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Distribuições de demanda dos pedidos: função (rng, tamanho, média) -> demandas inteiras >= 1
+DEMAND_DISTRIBUTIONS = {
+    "constant": lambda rng, size, mean: np.full(size, max(1, round(mean))),
+    "uniform": lambda rng, size, mean: rng.integers(1, max(2, round(2 * mean)), size=size, endpoint=True),
+    "poisson": lambda rng, size, mean: 1 + rng.poisson(max(mean - 1, 0), size=size),
+    # Cauda longa: a maioria dos pedidos é pequena, alguns são muito maiores que a média
+    "lognormal": lambda rng, size, mean: np.maximum(1, np.rint(rng.lognormal(np.log(mean) - 0.5, 1.0, size=size))),
+}
+
+# Modelos de veículo sorteados para a frota: (modelo, capacidade, custo por km)
+VEHICLE_MODELS = [
+    ("Moto", 20, 0.3),
+    ("Van", 100, 0.8),
+    ("Caminhão 3/4", 300, 1.5),
+]
+
+
+def _graph_points(rng: np.random.Generator, size: int, jitter: float = 0.0003) -> np.ndarray:
+    """
+    Sorteia `size` pontos (latitude, longitude) sobre a malha viária: a posição de nós
+    aleatórios do grafo, deslocada de até ~30 m.
+    """
+    nodes = list(graph.graph.nodes)
+    chosen = rng.integers(0, len(nodes), size=size)
+    coords = np.array([(graph.graph.nodes[nodes[i]]["y"], graph.graph.nodes[nodes[i]]["x"]) for i in chosen])
+    return coords + rng.uniform(-jitter, jitter, size=coords.shape)
+
+
+def _insert_batches(session, model, rows: list[dict], batch_size: int) -> list[int]:
+    """Insere as linhas em lotes de `batch_size` e retorna os IDs gerados, na ordem das linhas."""
+    ids = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        ids.extend(session.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), batch))
+    return ids
+
+
+def generate_workload(num_customers: int = 20000, num_orders: int = 50000, num_depots: int = 3,
+                      vehicles_per_depot: int = 20, num_plannings: int = 30, orders_per_planning: int = 200,
+                      demand_distribution: str = "poisson", mean_demand: float = 5,
+                      with_deadlines: bool = False, seed: int = 0, batch_size: int = 5000) -> dict:
+    """
+    Gera e insere um conjunto de dados sintético, em uma única transação.
+
+    Args:
+        num_customers: Número de clientes.
+        num_orders: Número de pedidos (todos pendentes), de clientes sorteados.
+        num_depots: Número de depósitos.
+        vehicles_per_depot: Veículos ativos por depósito.
+        num_plannings: Planejamentos pendentes, distribuídos entre os depósitos.
+        orders_per_planning: Pedidos associados a cada planejamento; os demais ficam sem planejamento.
+        demand_distribution: Nome da distribuição de demandas (ver DEMAND_DISTRIBUTIONS).
+        mean_demand: Demanda média aproximada dos pedidos.
+        with_deadlines: Se True, os planejamentos recebem prazos de 1 a N dias a partir de agora
+            (a otimização passa a respeitá-los); caso contrário, ficam sem prazo.
+        seed: Semente do gerador aleatório; o mesmo seed gera os mesmos dados.
+        batch_size: Número de linhas por comando de inserção.
+
+    Returns:
+        Um dicionário com o número de linhas inseridas por tabela e o tempo total.
+    """
+    if demand_distribution not in DEMAND_DISTRIBUTIONS:
+        raise ValueError(f"Distribuição de demanda desconhecida: {demand_distribution}")
+    if num_plannings * orders_per_planning > num_orders:
+        raise ValueError("Pedidos insuficientes para preencher os planejamentos")
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    # Datas relativas a uma referência fixa, para que o conjunto seja reprodutível
+    reference = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    # Prazos relativos ao momento atual: um prazo já vencido tornaria o planejamento inviável
+    now = datetime.now(timezone.utc)
+
+    # Placas com o seed completo: seeds distintos nunca geram a mesma placa
+    plates = [f"S{seed}-{i}" for i in range(num_depots * vehicles_per_depot)]
+    plate_length = Vehicles.__table__.c.plate.type.length
+    if max(map(len, plates), default=0) > plate_length:
+        raise ValueError(f"Placas sintéticas com mais de {plate_length} caracteres: "
+                         f"use um seed menor ou menos veículos")
+
+    with Session() as session:
+        with session.begin():
+            clash = session.scalars(select(Vehicles.plate).where(Vehicles.plate.in_(plates)).limit(1)).first()
+            if clash is not None:
+                raise ValueError(f"A placa {clash} já existe: a carga com seed={seed} já foi inserida")
+            depot_coords = _graph_points(rng, num_depots)
+            depot_ids = _insert_batches(session, Depots, [
+                {"name": f"Depósito sintético {seed}-{i + 1}", "address": "Gerado automaticamente",
+                 "latitude": float(lat), "longitude": float(lon), "created_at": reference}
+                for i, (lat, lon) in enumerate(depot_coords)
+            ], batch_size)
+
+            models = rng.integers(0, len(VEHICLE_MODELS), size=num_depots * vehicles_per_depot)
+            vehicle_rows = []
+            for i, m in enumerate(models):
+                model, capacity, cost_per_km = VEHICLE_MODELS[m]
+                vehicle_rows.append({
+                    "model": model, "plate": plates[i], "capacity": capacity,
+                    "cost_per_km": cost_per_km, "depot_id": depot_ids[i // vehicles_per_depot],
+                    "created_at": reference,
+                })
+            _insert_batches(session, Vehicles, vehicle_rows, batch_size)
+
+            customer_coords = _graph_points(rng, num_customers)
+            customer_ids = _insert_batches(session, Costumers, [
+                {"name": f"Cliente {i + 1}", "email": f"synthetic-{seed}-{i + 1}@example.com",
+                 "address": "Gerado automaticamente", "latitude": float(lat), "longitude": float(lon),
+                 "created_at": reference}
+                for i, (lat, lon) in enumerate(customer_coords)
+            ], batch_size)
+
+            planning_ids = _insert_batches(session, Planning, [
+                {"depot_id": depot_ids[i % num_depots], "status": PlanningStatus.pending,
+                 "deadline": now + timedelta(days=1 + i // num_depots) if with_deadlines else None,
+                 "created_at": reference}
+                for i in range(num_plannings)
+            ], batch_size)
+
+            demands = DEMAND_DISTRIBUTIONS[demand_distribution](rng, num_orders, mean_demand)
+            customers = rng.integers(0, num_customers, size=num_orders)
+            # Os primeiros pedidos preenchem os planejamentos; o restante fica sem planejamento
+            order_rows = []
+            for i, (c, demand) in enumerate(zip(customers, demands)):
+                p = i // orders_per_planning
+                order_rows.append({
+                    "customer_id": customer_ids[c], "demand": int(demand), "status": OrderStatus.pending,
+                    "planning_id": planning_ids[p] if p < num_plannings else None, "created_at": reference,
+                })
+            _insert_batches(session, Orders, order_rows, batch_size)
+
+    summary = {
+        "depots": num_depots,
+        "vehicles": len(vehicle_rows),
+        "customers": num_customers,
+        "plannings": num_plannings,
+        "orders": num_orders,
+        "time": time.perf_counter() - start,
+    }
+    logger.info(f"Carga sintética (seed={seed}) inserida em {summary['time']:.1f}s: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Insere uma carga sintética no banco de dados.")
+    parser.add_argument("--customers", type=int, default=20000, help="Número de clientes")
+    parser.add_argument("--orders", type=int, default=50000, help="Número de pedidos")
+    parser.add_argument("--depots", type=int, default=3, help="Número de depósitos")
+    parser.add_argument("--vehicles-per-depot", type=int, default=20, help="Veículos por depósito")
+    parser.add_argument("--plannings", type=int, default=30, help="Número de planejamentos pendentes")
+    parser.add_argument("--orders-per-planning", type=int, default=200, help="Pedidos por planejamento")
+    parser.add_argument("--demand", default="poisson", choices=list(DEMAND_DISTRIBUTIONS),
+                        help="Distribuição das demandas dos pedidos")
+    parser.add_argument("--mean-demand", type=float, default=5, help="Demanda média dos pedidos")
+    parser.add_argument("--deadlines", action="store_true",
+                        help="Define prazos para os planejamentos (1 a N dias a partir de agora)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do gerador aleatório")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Linhas por comando de inserção")
+    args = parser.parse_args()
+
+    generate_workload(
+        num_customers=args.customers, num_orders=args.orders, num_depots=args.depots,
+        vehicles_per_depot=args.vehicles_per_depot, num_plannings=args.plannings,
+        orders_per_planning=args.orders_per_planning, demand_distribution=args.demand,
+        mean_demand=args.mean_demand, with_deadlines=args.deadlines, seed=args.seed,
+        batch_size=args.batch_size,
+    )
@@ -0,0 +1,250 @@
+"""
+Benchmark do solver com instâncias clássicas de CVRP (formato CVRPLIB/TSPLIB).
+
+Executa `solve_vrp` (backend/router.py) com cada perfil de `SOLVER_PROFILES` em cada
+instância e mede:
+    - tempo até a primeira solução (primeira chamada de `on_solution`);
+    - tempo total e objetivo final;
+    - gap em relação à melhor solução conhecida (BKS);
+    - pico de memória (RSS) do processo que executou o solver.
+
+Cada execução roda em um processo novo (spawn), para que o pico de memória de uma não
+contamine a seguinte. O resultado é gravado em JSON, junto com o commit atual, para
+comparação entre versões do código (`--compare`).
+
+As instâncias ficam em benchmarks/instances (arquivos .vrp, com o .sol opcional ao lado).
+A BKS é lida do arquivo .sol ("Cost ...") ou do comentário da instância ("Optimal value: ...").
+Outras instâncias do CVRPLIB (ex.: conjuntos A de Augerat e X de Uchoa) podem ser
+copiadas para o diretório, ou passadas diretamente na linha de comando.
+
+Uso:
+    python -m benchmarks.cvrp_bench --profiles fast balanced --output bench.json
+    python -m benchmarks.cvrp_bench --compare bench_anterior.json
+"""
+# Imports de bibliotecas padrão
+import argparse
+import glob
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import time
+
+INSTANCES_DIR = os.path.join(os.path.dirname(__file__), "instances")
+
+
+def read_instance(path: str) -> dict:
+    """
+    Lê uma instância de CVRP no formato CVRPLIB (EDGE_WEIGHT_TYPE EUC_2D).
+
+    Returns:
+        Um dicionário com name, coordinates, demands, capacity, depot (índice base 0),
+        num_vehicles (do sufixo "-kN" do nome, quando houver) e bks (ou None).
+    """
+    specs, sections, section = {}, {}, None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line == "EOF":
+                continue
+            if line.endswith("_SECTION"):
+                section = line
+                sections[section] = []
+            elif re.match(r"^[A-Z_]+\s*:", line):
+                key, value = line.split(":", 1)
+                specs[key.strip()] = value.strip()
+                section = None
+            elif section:
+                sections[section].append(line.split())
+
+    if specs.get("EDGE_WEIGHT_TYPE", "EUC_2D") != "EUC_2D":
+        raise ValueError(f"{path}: EDGE_WEIGHT_TYPE {specs['EDGE_WEIGHT_TYPE']} não suportado")
+    coordinates = [(float(x), float(y)) for _, x, y in sections["NODE_COORD_SECTION"]]
+    demands = [int(d) for _, d in sections["DEMAND_SECTION"]]
+    depot = int(sections["DEPOT_SECTION"][0][0]) - 1
+
+    name = specs.get("NAME", os.path.splitext(os.path.basename(path))[0])
+    match = re.search(r"-k(\d+)", name)
+    num_vehicles = int(match.group(1)) if match else None
+
+    bks = None
+    sol_path = os.path.splitext(path)[0] + ".sol"
+    if os.path.exists(sol_path):
+        with open(sol_path) as f:
+            match = re.search(r"^Cost\s+([\d.]+)", f.read(), re.MULTILINE)
+        bks = float(match.group(1)) if match else None
+    if bks is None:
+        match = re.search(r"(?:Optimal|Best) value:\s*([\d.]+)", specs.get("COMMENT", ""))
+        bks = float(match.group(1)) if match else None
+
+    return {
+        "name": name,
+        "coordinates": coordinates,
+        "demands": demands,
+        "capacity": int(specs["CAPACITY"]),
+        "depot": depot,
+        "num_vehicles": num_vehicles,
+        "bks": bks,
+    }
+
+
+def distance_matrix(coordinates: list[tuple[float, float]]) -> list[list[int]]:
+    """Matriz de distâncias euclidianas arredondadas ao inteiro mais próximo (convenção TSPLIB)."""
+    return [[int(math.hypot(xi - xj, yi - yj) + 0.5) for xj, yj in coordinates]
+            for xi, yi in coordinates]
+
+
+def build_input_data(instance: dict, profile: str, extra_vehicles: int = 0) -> dict:
+    """Monta o dicionário de entrada de `solve_vrp` para a instância e o perfil."""
+    from backend.router import SOLVER_PROFILES
+    num_vehicles = instance["num_vehicles"]
+    if num_vehicles is None:
+        # Sem o número de veículos no nome, usa o limite inferior pela capacidade
+        num_vehicles = math.ceil(sum(instance["demands"]) / instance["capacity"])
+    num_vehicles += extra_vehicles
+    return {
+        "distance_matrix": distance_matrix(instance["coordinates"]),
+        "num_vehicles": num_vehicles,
+        "depot": instance["depot"],
+        "demands": instance["demands"],
+        "vehicle_capacities": [instance["capacity"]] * num_vehicles,
+        **SOLVER_PROFILES[profile],
+    }
+
+
+def _peak_rss_mb() -> float:
+    """Pico de memória residente do processo atual, em MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é dado em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run(path: str, profile: str, extra_vehicles: int, connection):
+    """Executa uma combinação instância/perfil e envia as medições ao processo pai."""
+    from backend.router import solve_vrp
+    instance = read_instance(path)
+    input_data = build_input_data(instance, profile, extra_vehicles)
+    baseline_rss = _peak_rss_mb()
+
+    first = {}
+
+    def on_solution(info: dict) -> bool:
+        first.setdefault("elapsed", info["elapsed"])
+        first.setdefault("objective", info["objective"])
+        return False
+
+    start = time.perf_counter()
+    result = solve_vrp(input_data, on_solution=on_solution)
+    total_time = time.perf_counter() - start
+
+    objective = None if "error" in result else result["objective"]
+    bks = instance["bks"]
+    connection.send({
+        "instance": instance["name"],
+        "profile": profile,
+        "num_nodes": len(instance["demands"]),
+        "num_vehicles": input_data["num_vehicles"],
+        "bks": bks,
+        "objective": objective,
+        "gap": (objective - bks) / bks if objective is not None and bks else None,
+        "first_solution_time": first.get("elapsed"),
+        "first_objective": first.get("objective"),
+        "total_time": total_time,
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+        "error": result.get("error"),
+    })
+    connection.close()
+
+
+def run_benchmark(paths: list[str], profiles: list[str], extra_vehicles: int = 0) -> list[dict]:
+    """Executa cada perfil em cada instância, uma execução por processo."""
+    ctx = mp.get_context("spawn")
+    results = []
+    for path in paths:
+        for profile in profiles:
+            parent_connection, child_connection = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_run, args=(path, profile, extra_vehicles, child_connection))
+            process.start()
+            child_connection.close()
+            try:
+                row = parent_connection.recv()
+            except EOFError:
+                row = {"instance": os.path.basename(path), "profile": profile,
+                       "error": "processo encerrado sem resultado"}
+            process.join()
+            results.append(row)
+            print(_format_row(row), flush=True)
+    return results
+
+
+def _git_commit() -> str | None:
+    """Commit atual do repositório, se disponível."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format_row(row: dict) -> str:
+    """Linha de resumo legível de uma execução."""
+    if row.get("objective") is None:
+        return f"{row['instance']:<20} {row['profile']:<10} erro: {row.get('error')}"
+    gap = f"{100 * row['gap']:6.2f}%" if row["gap"] is not None else "    -  "
+    return (f"{row['instance']:<20} {row['profile']:<10} obj={row['objective']:<10} gap={gap} "
+            f"1ª={row['first_solution_time']:.3f}s total={row['total_time']:.2f}s "
+            f"rss={row['peak_rss_mb']:.0f}MB")
+
+
+def compare(current: list[dict], previous: list[dict]):
+    """Imprime a variação de objetivo, tempo e memória em relação a um benchmark anterior."""
+    before = {(r["instance"], r["profile"]): r for r in previous}
+    for row in current:
+        old = before.get((row["instance"], row["profile"]))
+        if not old or row.get("objective") is None or old.get("objective") is None:
+            continue
+        print(f"{row['instance']:<20} {row['profile']:<10} "
+              f"obj {old['objective']} -> {row['objective']} | "
+              f"1ª {old['first_solution_time']:.3f}s -> {row['first_solution_time']:.3f}s | "
+              f"total {old['total_time']:.2f}s -> {row['total_time']:.2f}s | "
+              f"rss {old['peak_rss_mb']:.0f}MB -> {row['peak_rss_mb']:.0f}MB")
+
+
+if __name__ == "__main__":
+    from backend.router import SOLVER_PROFILES
+
+    parser = argparse.ArgumentParser(description="Benchmark do solve_vrp com instâncias do CVRPLIB.")
+    parser.add_argument("instances", nargs="*",
+                        help="Arquivos .vrp (padrão: todos em benchmarks/instances)")
+    parser.add_argument("--profiles", nargs="+", default=list(SOLVER_PROFILES),
+                        choices=list(SOLVER_PROFILES), help="Perfis do solver a executar")
+    parser.add_argument("--extra-vehicles", type=int, default=0,
+                        help="Veículos além do número indicado no nome da instância")
+    parser.add_argument("--output", help="Arquivo JSON onde gravar os resultados")
+    parser.add_argument("--compare", help="Arquivo JSON de um benchmark anterior para comparação")
+    args = parser.parse_args()
+
+    paths = args.instances or sorted(glob.glob(os.path.join(INSTANCES_DIR, "*.vrp")))
+    results = run_benchmark(paths, args.profiles, args.extra_vehicles)
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"\nComparação com o commit {previous.get('commit')}:")
+        compare(results, previous["results"])
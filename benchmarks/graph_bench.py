@@ -0,0 +1,167 @@
+"""
+Benchmark das consultas de distância da classe Graph (backend/graph.py) na malha viária local.
+
+Para cada n (padrão: 10, 50, 200 e 1000 pontos sorteados dentro da cidade) mede:
+    - `Graph.distance_matrix` com cada engine de matriz ("pairwise", "dijkstra");
+    - `Graph.distance` e `Graph.route` em pares consecutivos dos pontos sorteados.
+Para cada caso são informados o tempo de parede, o número de buscas de caminho mínimo
+(`Graph.searches`) e o pico de memória (RSS).
+
+Roda sem acesso à rede: o grafo é lido do arquivo local (fortaleza.ghml). Cada caso roda em
+um processo filho (fork), que herda o grafo já carregado, para que as caches e o pico de
+memória de um caso não afetem os demais.
+
+Uso:
+    python -m benchmarks.graph_bench --sizes 10 50 200 --output graph_bench.json
+"""
+# Imports de bibliotecas padrão
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import time
+
+# Imports de bibliotecas de terceiros
+import numpy as np
+
+DEFAULT_SIZES = [10, 50, 200, 1000]
+MATRIX_ENGINES = ["pairwise", "dijkstra"]
+
+
+def _rss_mb() -> float:
+    """Pico de memória residente, em MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é dado em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def random_points(graph, n: int, seed: int) -> list[tuple[float, float]]:
+    """
+    Sorteia n pontos (latitude, longitude) dentro da cidade: a posição de nós aleatórios do
+    grafo, deslocada de até ~50 m para que o mapeamento para o nó mais próximo também seja exercitado.
+    """
+    rng = np.random.default_rng(seed)
+    nodes = list(graph.graph.nodes)
+    chosen = rng.choice(len(nodes), size=n, replace=len(nodes) < n)
+    jitter = rng.uniform(-0.0005, 0.0005, size=(n, 2))
+    return [(graph.graph.nodes[nodes[i]]["y"] + dy, graph.graph.nodes[nodes[i]]["x"] + dx)
+            for i, (dy, dx) in zip(chosen, jitter)]
+
+
+def _case(graph, kind: str, engine: str | None, points: list, pairs: int):
+    """Executa um caso do benchmark. Retorna o número de consultas realizadas."""
+    if kind == "distance_matrix":
+        graph.distance_matrix(points, engine=engine)
+        return 1
+    method = graph.distance if kind == "distance" else graph.route
+    count = min(pairs, len(points) - 1)
+    for a, b in zip(points[:count], points[1:count + 1]):
+        try:
+            method(a, b)
+        except Exception:  # pares sem caminho também contam como consulta
+            pass
+    return count
+
+
+def _run_case(graph, kind, engine, points, pairs, connection):
+    """Processo filho: executa o caso e envia as medições ao processo pai."""
+    graph.searches = 0
+    start = time.perf_counter()
+    calls = _case(graph, kind, engine, points, pairs)
+    connection.send({
+        "wall_time": time.perf_counter() - start,
+        "calls": calls,
+        "searches": graph.searches,
+        "peak_rss_mb": _rss_mb(),
+    })
+    connection.close()
+
+
+def run_benchmark(graph, sizes: list[int], engines: list[str], pairs: int = 100,
+                  max_pairwise: int = 200, seed: int = 0) -> list[dict]:
+    """Executa todos os casos e retorna uma linha de resultado por caso."""
+    ctx = mp.get_context("fork")
+    baseline_rss = _rss_mb()
+    results = []
+    for n in sizes:
+        points = random_points(graph, n, seed)
+        cases = [("distance_matrix", engine) for engine in engines]
+        cases += [("distance", None), ("route", None)]
+        for kind, engine in cases:
+            row = {"n": n, "method": kind, "engine": engine}
+            if kind == "distance_matrix" and engine == "pairwise" and n > max_pairwise:
+                # n² buscas do networkx: horas para n=1000 na malha de Fortaleza
+                row["skipped"] = f"n > {max_pairwise}"
+                results.append(row)
+                print(_format_row(row), flush=True)
+                continue
+            parent_connection, child_connection = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_run_case,
+                                  args=(graph, kind, engine, points, pairs, child_connection))
+            process.start()
+            child_connection.close()
+            try:
+                row.update(parent_connection.recv())
+                row["baseline_rss_mb"] = baseline_rss
+            except EOFError:
+                row["error"] = "processo encerrado sem resultado"
+            process.join()
+            results.append(row)
+            print(_format_row(row), flush=True)
+    return results
+
+
+def _format_row(row: dict) -> str:
+    """Linha de resumo legível de um caso."""
+    label = f"n={row['n']:<5} {row['method']:<16} {row['engine'] or '':<9}"
+    if "skipped" in row:
+        return f"{label} ignorado ({row['skipped']})"
+    if "error" in row:
+        return f"{label} erro: {row['error']}"
+    return (f"{label} tempo={row['wall_time']:8.3f}s chamadas={row['calls']:<5} "
+            f"buscas={row['searches']:<8} rss={row['peak_rss_mb']:.0f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das consultas de distância do Graph.")
+    parser.add_argument("--graph", default="fortaleza.ghml", help="Arquivo GraphML local da malha viária")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Números de pontos")
+    parser.add_argument("--engines", nargs="+", default=MATRIX_ENGINES, choices=MATRIX_ENGINES,
+                        help="Engines de matriz de distâncias a comparar")
+    parser.add_argument("--pairs", type=int, default=100,
+                        help="Máximo de pares consultados em Graph.distance e Graph.route")
+    parser.add_argument("--max-pairwise", type=int, default=200,
+                        help="Maior n para o qual a engine 'pairwise' é executada")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do sorteio dos pontos")
+    parser.add_argument("--output", help="Arquivo JSON onde gravar os resultados")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.graph):
+        # Sem o arquivo, Graph tentaria baixar a malha, e o benchmark deve rodar offline
+        sys.exit(f"Arquivo {args.graph} não encontrado.")
+    start = time.perf_counter()
+    # O módulo carrega a malha padrão (fortaleza.ghml no diretório atual) ao ser importado
+    from backend import graph as graph_module
+    if os.path.abspath(args.graph) == os.path.abspath(graph_module._DEFAULT_GRAPH_FILE_NAME):
+        graph = graph_module.graph
+    else:
+        graph = graph_module.Graph(args.graph)
+    load_time = time.perf_counter() - start
+    print(f"Grafo com {len(graph.graph.nodes)} nós carregado em {load_time:.1f}s.")
+
+    results = run_benchmark(graph, args.sizes, args.engines, args.pairs, args.max_pairwise, args.seed)
+    if args.output:
+        report = {
+            "graph": os.path.basename(args.graph),
+            "graph_version": graph.version,
+            "num_nodes": len(graph.graph.nodes),
+            "load_time": load_time,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
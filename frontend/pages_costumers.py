@@ -3,7 +3,7 @@ Gerenciamento de clientes: cadastro, edição, ativar/desativar, lista e mapa.
 """
 from nicegui import ui
 from backend.controler import (
-    get_customers,
+    get_customer_rows,
     add_customer,
     update_customer,
     toggle_customer_active,
@@ -155,7 +155,7 @@ def customer_list():
                             value=ui.state.show_disabled_customers,
                             on_change=lambda e: toggle_show_disabled(e.value))
         with ui.scroll_area().classes("h-[calc(100vh-250px)] overflow-y-auto"):
-            if customers := get_customers():
+            if customers := get_customer_rows():
                 for customer in customers:
                     with ui.card().classes("w-full") as customer_spam, \
                             ui.row().classes("items-center justify-between w-full"):
@@ -186,7 +186,7 @@ def customer_list():
 
 
 def customer_map():
-    custs = get_customers()
+    custs = get_customer_rows()
     if custs:
         lats = [c.latitude for c in custs if c.latitude is not None]
         lons = [c.longitude for c in custs if c.longitude is not None]
@@ -7,7 +7,7 @@ Definição das páginas e componentes de gerenciamento de depósitos:
 
 from nicegui import ui
 from backend.controler import (
-    get_depots,
+    get_depot_rows,
     add_depot,
     update_depot,
     toggle_depot_active,
@@ -194,7 +194,7 @@ def depot_list():
                             value=ui.state.show_disabled_depots,
                             on_change=lambda e: toggle_show_disabled(e.value))
         with ui.scroll_area().classes("h-[calc(100vh-250px)] overflow-y-auto"):
-            if depots := get_depots():
+            if depots := get_depot_rows():
                 for depot in depots:
                     with ui.card().classes("w-full") as depot_spam, \
                             ui.row().classes("items-center justify-between w-full"):                        
@@ -235,7 +235,7 @@ def depot_map():
     """
     Renderiza cartão com mapa (Folium) dos depósitos ativos ou desativados conforme o estado.
     """
-    depositos = get_depots()
+    depositos = get_depot_rows()
     if depositos:
         lats = [d.latitude for d in depositos if d.latitude]
         lons = [d.longitude for d in depositos if d.longitude]
@@ -3,7 +3,8 @@ Gerenciamento de pedidos: cadastro, edição, cancelamento, lista.
 """
 from nicegui import ui
 from backend.controler import (
-    get_orders,
+    get_orders_page,
+    get_order_by_id,
     add_order,
     update_order,
     get_customers,
@@ -18,6 +19,18 @@ from statistics import mean
 ui.state.order_status_filter = 'all'  # Estado para o filtro de status
 _order_list = None # type: ignore
 _order_map_container = None # type: ignore
+_order_cards = None # type: ignore  # coluna com os cartões das páginas já carregadas
+_load_more_button = None # type: ignore
+_loaded_orders = []  # pedidos das páginas já carregadas (lista e mapa)
+_next_after = None  # token da próxima página de pedidos (None na última)
+
+# Mapeamento de status para os badges
+STATUS_BADGES = {
+    OrderStatus.delivered: ("Entregue", "positive"),
+    OrderStatus.cancelled: ("Cancelado", "negative"),
+    OrderStatus.pending: ("Pendente", "orange"),
+    OrderStatus.processing: ("Em Processamento", "info")
+}
 
 def add_order_dialog():
     def save():
@@ -117,6 +130,7 @@ def edit_order_dialog(order_obj):
     dialog.open()
 
 def order_list():
+    global _order_cards, _load_more_button, _loaded_orders, _next_after
     _order_list.clear()
     with _order_list:
         with ui.card().classes("w-full"):
@@ -141,50 +155,61 @@ def order_list():
                           value=ui.state.order_status_filter,
                           on_change=handle_filter_change).classes("w-32")
         with ui.scroll_area().classes("h-[calc(100vh-250px)] overflow-y-auto"):
-            # Mapeamento de status para os badges. Definido uma vez fora do loop para eficiência.
-            status_map = {
-                OrderStatus.delivered: ("Entregue", "positive"),
-                OrderStatus.cancelled: ("Cancelado", "negative"),
-                OrderStatus.pending: ("Pendente", "orange"),
-                OrderStatus.processing: ("Em Processamento", "info")
-            }
-            if orders:=get_orders(status_filter=ui.state.order_status_filter):
-                for o in orders:
-                    with ui.card().classes("w-full mb-2"):
-                        with ui.row().classes("w-full justify-between"):
-                            # Coluna de status e ações
-                            with ui.column().classes("items-end"):
-                                
-                                # with ui.row().classes("gap-1"):
-                                ui.button(icon="edit", on_click=lambda ord_obj=o: edit_order_dialog(ord_obj), color="primary").tooltip("Editar Pedido").props("flat dense")
-                                if o.status in [OrderStatus.pending, OrderStatus.processing]:
-                                    ui.button(icon="cancel", on_click=lambda ord_obj=o: cancel_order(ord_obj.id) and refresh(f"Pedido {ord_obj.id} cancelado!"), color="negative").tooltip("Cancelar Pedido").props("flat dense")
-                                elif o.status == OrderStatus.cancelled:
-                                    ui.button(icon="restore", on_click=lambda ord_obj=o: restore_order(ord_obj.id) and refresh(f"Pedido {ord_obj.id} restaurado!"), color="positive").tooltip("Restaurar Pedido").props("flat dense")
-                            # Coluna de informações do pedido
-                            with ui.column().classes("gap-0"):
-                                ui.label(f"Cliente: {o.customer.name if o.customer else 'N/A'}").classes("font-semibold text-base")
-                                with ui.row().classes("text-sm text-gray-600 items-center gap-2"):
-                                    ui.label(f"ID: {o.id}")
-                                    ui.separator().props('vertical')
-                                    ui.label(f"Demanda: {o.demand}")
-                                    ui.separator().props('vertical')
-                                    ui.label(f"Planejamento: {o.planning_id if o.planning_id else 'Nenhum'}")
-                                with ui.row().classes("w-full"):
-                                    ui.label(f"Criado em: {o.created_at.strftime('%d/%m/%Y %H:%M') if o.created_at else 'N/A'}").classes("text-xs text-gray-500 mt-1")
-                                    status_text, status_color = status_map.get(o.status, ("Desconhecido", "grey"))
-                                    ui.space().props('vertical')
-                                    ui.badge(status_text, color=status_color)
-            else:
-                ui.label("Nenhum pedido encontrado.")
+            _order_cards = ui.column().classes("w-full gap-0")
+            _loaded_orders, _next_after = [], None
+            _load_more_button = ui.button("Carregar mais", on_click=lambda: load_more_orders(),
+                                          icon="expand_more").props("flat").classes("w-full")
+            load_more_orders(update_map=False)
+            if not _loaded_orders:
+                with _order_cards:
+                    ui.label("Nenhum pedido encontrado.")
+
+def load_more_orders(update_map: bool = True):
+    """Carrega a próxima página de pedidos no final da lista (e no mapa)."""
+    global _next_after
+    orders, _next_after = get_orders_page(status_filter=ui.state.order_status_filter, after=_next_after)
+    _loaded_orders.extend(orders)
+    with _order_cards:
+        for o in orders:
+            order_card(o)
+    _load_more_button.set_visibility(_next_after is not None)
+    if update_map:
+        order_map()
+
+def order_card(o):
+    with ui.card().classes("w-full mb-2"):
+        with ui.row().classes("w-full justify-between"):
+            # Coluna de status e ações
+            with ui.column().classes("items-end"):
+                ui.button(icon="edit", on_click=lambda ord_obj=o: edit_order_dialog(get_order_by_id(ord_obj.id)), color="primary").tooltip("Editar Pedido").props("flat dense")
+                if o.status in [OrderStatus.pending, OrderStatus.processing]:
+                    ui.button(icon="cancel", on_click=lambda ord_obj=o: cancel_order(ord_obj.id) and refresh(f"Pedido {ord_obj.id} cancelado!"), color="negative").tooltip("Cancelar Pedido").props("flat dense")
+                elif o.status == OrderStatus.cancelled:
+                    ui.button(icon="restore", on_click=lambda ord_obj=o: restore_order(ord_obj.id) and refresh(f"Pedido {ord_obj.id} restaurado!"), color="positive").tooltip("Restaurar Pedido").props("flat dense")
+            # Coluna de informações do pedido
+            with ui.column().classes("gap-0"):
+                ui.label(f"Cliente: {o.customer_name}").classes("font-semibold text-base")
+                with ui.row().classes("text-sm text-gray-600 items-center gap-2"):
+                    ui.label(f"ID: {o.id}")
+                    ui.separator().props('vertical')
+                    ui.label(f"Demanda: {o.demand}")
+                    ui.separator().props('vertical')
+                    ui.label(f"Planejamento: {o.planning_id if o.planning_id else 'Nenhum'}")
+                with ui.row().classes("w-full"):
+                    ui.label(f"Criado em: {o.created_at.strftime('%d/%m/%Y %H:%M') if o.created_at else 'N/A'}").classes("text-xs text-gray-500 mt-1")
+                    status_text, status_color = STATUS_BADGES.get(o.status, ("Desconhecido", "grey"))
+                    ui.space().props('vertical')
+                    ui.badge(status_text, color=status_color)
 
 def order_map():
     global _order_map
     if not _order_map:
         return
 
-    if orders:=get_orders(status_filter=ui.state.order_status_filter):
-        customers_on_map = {o.customer.id: o.customer for o in orders if o.customer and o.customer.latitude and o.customer.longitude}
+    # Apenas os pedidos das páginas já carregadas na lista
+    if orders:=_loaded_orders:
+        # Um marcador por cliente
+        customers_on_map = {o.customer_id: o for o in orders if o.latitude and o.longitude}
         unique_customers = list(customers_on_map.values())
         if unique_customers:
             lats = [c.latitude for c in unique_customers if c.latitude is not None]
@@ -199,12 +224,14 @@ def order_map():
                 for cust in unique_customers:
                     folium.Marker(
                         location=[cust.latitude, cust.longitude],
-                        popup=f"Cliente: {cust.name}<br>ID: {cust.id}",
-                        icon=folium.Icon(color="blue" if cust.active else "gray")
+                        popup=f"Cliente: {cust.customer_name}<br>ID: {cust.customer_id}",
+                        icon=folium.Icon(color="blue" if cust.customer_active else "gray")
                     ).add_to(m)
         else:
             # Mapa de fallback em Fortaleza CE se não houver clientes com pedidos
             m = folium.Map(location=[-3.7327, -38.5267], zoom_start=12)
+    else:
+        m = folium.Map(location=[-3.7327, -38.5267], zoom_start=12)
     
     _order_map.clear()
     with _order_map:
@@ -3,46 +3,72 @@ Gerenciamento de planejamentos: cadastro, edição, lista e detalhes.
 """
 from statistics import mean
 import folium
-from nicegui import ui
+from nicegui import ui, run
 from backend.controler import (
-    get_plannings,
+    get_plannings_page,
+    get_planning_rows,
+    get_planning_order_rows,
     add_planning,
     update_planning,
     get_depots,
     cancel_planning,
     restore_order,
     restore_planning,
-    get_orders,
+    get_orders_page,
     assign_orders_to_planning,
     remove_order_from_planning,
-    optimize_planning,
+    insert_orders_into_planning,
+    release_planning,
+    get_optimization_runs,
+    check_planning_feasibility,
+    optimize_plannings_jointly,
     get_planning_by_id
 )
+from backend.jobs import optimization_queue
 from backend.model import PlanningStatus
-from datetime import datetime
+from datetime import datetime, timezone
 
 _planning_list = None  # type: ignore
 _planning_map = None  # type: ignore
+_progress_labels = {}  # planning_id -> label com o progresso do solver
+_planning_cards = None  # type: ignore  # coluna com os cartões das páginas já carregadas
+_load_more_button = None  # type: ignore
+_next_after = None  # token da próxima página de planejamentos (None na última)
+
+STATUS_BADGES = {
+    PlanningStatus.pending: ("Pendente", "orange"),
+    PlanningStatus.optimizing: ("Otimizando", "info"),
+    PlanningStatus.ready: ("Pronto", "positive"),
+    PlanningStatus.executed: ("Executado", "green"),
+    PlanningStatus.cancelled: ("Cancelado", "negative"),
+}
 
 # Inicializa o estado global para o filtro de status
 if not hasattr(ui.state, 'planning_status_filter'):
     ui.state.planning_status_filter = 'all'  # Valor padrão
 
+def to_local_time(dt_obj: datetime) -> datetime:
+    """Converte um datetime do banco (UTC, sem fuso no SQLite) para o horário local."""
+    if dt_obj.tzinfo is None:
+        dt_obj = dt_obj.replace(tzinfo=timezone.utc)
+    return dt_obj.astimezone()
+
 def format_datetime_for_input(dt_obj: datetime | None) -> tuple[str | None, str | None]:
-    """Converte datetime para strings de data (YYYY-MM-DD) e hora (HH:MM) para inputs."""
+    """Converte datetime para strings de data (YYYY-MM-DD) e hora (HH:MM), no horário local, para inputs."""
     if dt_obj:
+        dt_obj = to_local_time(dt_obj)
         return dt_obj.strftime('%Y-%m-%d'), dt_obj.strftime('%H:%M')
     return None, None
 
 def parse_datetime_from_input(date_str: str | None, time_str: str | None) -> datetime | None:
-    """Converte strings de data e hora dos inputs para um objeto datetime."""
+    """Converte strings de data e hora dos inputs (horário local) para um datetime em UTC."""
     if date_str and time_str:
         try:
             # ui.date retorna YYYY/MM/DD, ui.time retorna HH:MM
             # Precisamos converter YYYY/MM/DD para YYYY-MM-DD para strptime
             dt_str_formatted = date_str.replace('/', '-')
             dt = datetime.strptime(f"{dt_str_formatted} {time_str}", '%Y-%m-%d %H:%M')
-            return dt
+            return dt.astimezone(timezone.utc)
         except ValueError:
             ui.notify("Formato de data ou hora inválido.", color="negative")
             return None
@@ -50,7 +76,7 @@ def parse_datetime_from_input(date_str: str | None, time_str: str | None) -> dat
         try:
             dt_str_formatted = date_str.replace('/', '-')
             dt = datetime.strptime(dt_str_formatted, '%Y-%m-%d')
-            return dt
+            return dt.astimezone(timezone.utc)
         except ValueError:
             ui.notify("Formato de data inválido.", color="negative")
             return None
@@ -162,22 +188,34 @@ def select_orders_for_planning_dialog(planning_obj):
         ui.label(f"Selecionar Pedidos para Planejamento - ID: {planning_obj.id}").classes("text-h6 mb-2")
         
         # Recupera apenas os pedidos com status 'pending' que não estão associados a nenhum planejamento
-        eligible_orders = [o for o in get_orders(status_filter='pending') if o.planning_id is None]
+        # (projeção paginada, sem carregar os objetos do ORM)
+        eligible_orders, after = get_orders_page(status_filter='pending', unassigned=True)
+        while after is not None:
+            page, after = get_orders_page(status_filter='pending', unassigned=True, after=after)
+            eligible_orders.extend(page)
         if not eligible_orders:
             ui.label("Nenhum pedido pendente disponível.").classes("mb-2")
         else:
             # Cria um dicionário com os pedidos elegíveis para seleção
-            order_options = {o.id: f"ID: {o.id} - Cliente: {o.customer.name} - Demanda: {o.demand}" for o in eligible_orders}
+            order_options = {o.id: f"ID: {o.id} - Cliente: {o.customer_name} - Demanda: {o.demand}" for o in eligible_orders}
             # Permite seleção múltipla
             selected_orders = ui.select(label="Pedidos Pendentes", options=order_options, multiple=True).classes("w-full mb-2")
         
-        def save():
+        async def save():
             if not eligible_orders or not selected_orders.value:
                 ui.notify("Selecione pelo menos um pedido.", color="negative")
                 return
             # Tenta atribuir os pedidos selecionados ao planejamento
             from backend.controler import assign_orders_to_planning  # Certifique-se de que esta função foi adicionada
-            if assign_orders_to_planning(planning_obj.id, selected_orders.value):
+            if planning_obj.status == PlanningStatus.ready:
+                # Planejamento já roteirizado: insere os pedidos nas rotas existentes. O cálculo das
+                # distâncias roda fora do loop de eventos, para não travar a interface
+                dialog.close()
+                ui.notify(f"Inserindo pedidos nas rotas do planejamento {planning_obj.id}...", color="info")
+                assigned = await run.io_bound(insert_orders_into_planning, planning_obj.id, selected_orders.value)
+            else:
+                assigned = assign_orders_to_planning(planning_obj.id, selected_orders.value)
+            if assigned:
                 refresh(f"Pedidos adicionados ao Planejamento {planning_obj.id}!")
             else:
                 ui.notify("Nenhum pedido foi atribuído. Verifique se os pedidos selecionados estão elegíveis.", color="negative")
@@ -188,30 +226,163 @@ def select_orders_for_planning_dialog(planning_obj):
             ui.button("Cancelar", on_click=dialog.close, color="negative", icon="close")
     dialog.open()
 
-def route_planning(planning_obj):
+def route_planning(planning_obj, drop_unserved: bool = False):
+    """
+    Envia o planejamento para a fila de otimização em segundo plano.
+    O status passa imediatamente para 'optimizing'; a lista é atualizada quando o job termina.
+    Se a frota não comportar os pedidos, mostra o motivo e oferece roteirizar apenas os pedidos viáveis.
+    """
+    if not drop_unserved:
+        issues = check_planning_feasibility(planning_obj.id)
+        if issues:
+            infeasible_planning_dialog(planning_obj, issues)
+            return
+    if optimization_queue.submit(planning_obj.id, drop_unserved=drop_unserved):
+        refresh(f"Planejamento {planning_obj.id} enviado para roteirização.", color="info")
+    else:
+        refresh(f"Não foi possível roteirizar o planejamento {planning_obj.id}.", color="negative")
+
+def infeasible_planning_dialog(planning_obj, issues: list[dict]):
+    """
+    Informa por que o planejamento não pode ser roteirizado por completo e permite
+    roteirizá-lo deixando de fora os pedidos que não puderem ser atendidos.
+    """
+    with ui.dialog() as dialog, ui.card():
+        ui.label(f"Planejamento {planning_obj.id} não pode ser atendido por completo").classes("text-h6")
+        for issue in issues:
+            ui.label(issue["message"]).classes("text-negative")
+
+        def route_feasible():
+            dialog.close()
+            route_planning(planning_obj, drop_unserved=True)
+
+        with ui.card_actions().classes("w-full justify-end"):
+            ui.button("Roteirizar pedidos viáveis", on_click=route_feasible, color="primary", icon="directions")
+            ui.button("Cancelar", on_click=dialog.close, color="negative", icon="close")
+    dialog.open()
+
+def stop_planning(planning_obj):
     """
-    Atualiza o status do planejamento para 'optimizing' e
-    exibe uma notificação informando que a integração com o roteirizador está pendente.
+    Encerra antecipadamente a busca do solver, gravando a melhor solução encontrada até agora.
+    """
+    if optimization_queue.stop(planning_obj.id):
+        ui.notify(f"Encerrando a otimização do planejamento {planning_obj.id} com a melhor solução atual...", color="info")
+    else:
+        ui.notify(f"Planejamento {planning_obj.id} não está em otimização.", color="negative")
+
+def progress_text(planning_id: int) -> str:
+    """Texto com a melhor solução recebida do solver para o planejamento."""
+    job = optimization_queue.status(planning_id)
+    if not job or job.state not in ("queued", "running"):
+        return ""
+    if job.state == "queued":
+        return "Na fila de otimização"
+    if not job.incumbent:
+        return "Calculando distâncias..."
+    used = sum(1 for r in job.incumbent["routes"] if len(r) > 2)
+    # Custo da frota em milésimos da unidade monetária (distância em metros × custo por km)
+    return (f"Melhor solução: custo R$ {job.incumbent['cost'] / 1000:.2f}, {used} rotas "
+            f"({len(job.progress)} melhorias em {job.incumbent['elapsed']:.0f}s)")
+
+def quick_route_planning(planning_obj):
     """
-    # TODO: Integrar com o roteirizador real
-    optimize_planning(planning_obj.id)
-    ui.notify(f"Planejamento {planning_obj.id} roteirizado! (Roteirizador: TODO)", color="info")
-    refresh(f"Planejamento {planning_obj.id} roteirizado!")
+    Roteiriza o planejamento com a heurística de economias (sem OR-Tools),
+    para obter rapidamente uma prévia plausível das rotas. Como a matriz de distâncias ainda
+    precisa ser calculada, a execução também vai para a fila de otimização em segundo plano.
+    """
+    if optimization_queue.submit(planning_obj.id, engine="savings"):
+        refresh(f"Planejamento {planning_obj.id} enviado para roteirização (heurística rápida).", color="info")
+    else:
+        refresh(f"Não foi possível roteirizar o planejamento {planning_obj.id}.", color="negative")
+
+def joint_route_dialog():
+    """
+    Roteiriza vários planejamentos pendentes, de depósitos distintos, como um único problema:
+    cada pedido é atendido pelo depósito mais conveniente e passa para o planejamento dele.
+    Planejamentos com prazo ficam de fora (a roteirização conjunta não considera prazos).
+    """
+    pending = [p for p in get_planning_rows(status_filter=[PlanningStatus.pending.name]) if p.deadline is None]
+    with ui.dialog() as dialog, ui.card():
+        ui.label("Roteirização Conjunta (Vários Depósitos)").classes("text-h6 mb-2")
+        options = {p.id: f"ID: {p.id} - Depósito: {p.depot_name} - Pedidos: {p.summary.order_count}" for p in pending}
+        selected = ui.select(label="Planejamentos Pendentes (sem prazo)", options=options, multiple=True).classes("w-full mb-2")
+
+        async def save():
+            ids = selected.value or []
+            depots = {p.depot_id for p in pending if p.id in ids}
+            if len(ids) < 2 or len(depots) != len(ids):
+                ui.notify("Selecione pelo menos dois planejamentos de depósitos distintos.", color="negative")
+                return
+            dialog.close()
+            ui.notify(f"Roteirizando os planejamentos {ids} em conjunto...", color="info")
+            if await run.io_bound(optimize_plannings_jointly, ids):
+                refresh(f"Planejamentos {ids} roteirizados em conjunto!")
+            else:
+                refresh(f"Não foi possível roteirizar os planejamentos {ids}.", color="negative")
+
+        with ui.card_actions().classes("w-full justify-end"):
+            ui.button("Roteirizar", on_click=save, color="primary", icon="hub")
+            ui.button("Cancelar", on_click=dialog.close, color="negative", icon="close")
+    dialog.open()
 
 def abort_planning(planning_obj):
     """
-    Aborta o planejamento que está em otimização, revertendo seu status para 'pending'.
-    TODO: Integrar a chamada real ao abortar o roteirizador.
+    Aborta a otimização do planejamento, encerrando o processo do solver,
+    e devolve o planejamento ao status anterior ('pending' ou 'ready').
     """
-    update_planning(
-        planning_id=planning_obj.id,
-        depot_id=planning_obj.depot_id,
-        deadline=planning_obj.deadline,
-        status_str="pending"
-    )
-    ui.notify(f"Planejamento {planning_obj.id} abortado! (Roteirizador: TODO)", color="info")
+    # Sem job ativo (ex.: servidor reiniciado durante a otimização), apenas libera o planejamento
+    if not optimization_queue.cancel(planning_obj.id):
+        release_planning(planning_obj.id)
     refresh(f"Planejamento {planning_obj.id} abortado!")
 
+def optimization_runs_dialog(planning_id: int | None = None):
+    """
+    Exibe a telemetria das otimizações (tempo de cada etapa, tamanho e objetivo),
+    de todos os planejamentos ou apenas do informado.
+    """
+    runs = get_optimization_runs(planning_id=planning_id)
+    columns = [
+        {"name": "created_at", "label": "Data", "field": "created_at", "align": "left"},
+        {"name": "planning_id", "label": "Planej.", "field": "planning_id"},
+        {"name": "profile", "label": "Perfil", "field": "profile"},
+        {"name": "engine", "label": "Método", "field": "engine"},
+        {"name": "solver_status", "label": "Status", "field": "solver_status"},
+        {"name": "num_orders", "label": "Pedidos", "field": "num_orders"},
+        {"name": "num_vehicles", "label": "Veículos", "field": "num_vehicles"},
+        {"name": "objective", "label": "Custo (R$)", "field": "objective"},
+        {"name": "snapping_time", "label": "Snap (s)", "field": "snapping_time"},
+        {"name": "matrix_time", "label": "Matriz (s)", "field": "matrix_time"},
+        {"name": "solver_time", "label": "Solver (s)", "field": "solver_time"},
+        {"name": "persistence_time", "label": "Gravação (s)", "field": "persistence_time"},
+        {"name": "total_time", "label": "Total (s)", "field": "total_time"},
+    ]
+    rows = [{
+        "id": r.id,
+        "created_at": r.created_at.strftime('%d/%m/%Y %H:%M:%S') if r.created_at else "",
+        "planning_id": r.planning_id,
+        "profile": r.profile,
+        "engine": r.engine,
+        "solver_status": r.solver_status,
+        "num_orders": r.num_orders,
+        "num_vehicles": r.num_vehicles,
+        "objective": f"{r.objective / 1000:.2f}" if r.objective is not None else "-",
+        "snapping_time": f"{r.snapping_time:.2f}",
+        "matrix_time": f"{r.matrix_time:.2f}",
+        "solver_time": f"{r.solver_time:.2f}",
+        "persistence_time": f"{r.persistence_time:.2f}",
+        "total_time": f"{r.total_time:.2f}",
+    } for r in runs]
+    with ui.dialog() as dialog, ui.card().classes("w-full max-w-none"):
+        title = f"Otimizações do Planejamento {planning_id}" if planning_id else "Histórico de Otimizações"
+        ui.label(title).classes("text-h6 mb-2")
+        if rows:
+            ui.table(columns=columns, rows=rows, row_key="id").props("dense flat").classes("w-full")
+        else:
+            ui.label("Nenhuma otimização registrada.")
+        with ui.card_actions().classes("w-full justify-end"):
+            ui.button("Fechar", on_click=dialog.close, color="negative", icon="close")
+    dialog.open()
+
 def show_planning_map(planning_id):
     """
     Exibe o mapa do planejamento com os depósitos e pedidos associados.
@@ -276,7 +447,9 @@ def show_planning_map(planning_id):
 
 
 def planning_list():
+    global _planning_cards, _load_more_button, _next_after
     _planning_list.clear()
+    _progress_labels.clear()
     with _planning_list:
         with ui.card().classes("w-full"):
             with ui.row().classes("items-center justify-between w-full"):
@@ -285,6 +458,10 @@ def planning_list():
             with ui.row().classes("w-full items-center justify-between"):
                 ui.button("Adicionar Planejamento", on_click=add_planning_dialog,
                           color="primary", icon="add")
+                ui.button(icon="query_stats", on_click=lambda: optimization_runs_dialog(),
+                          color="secondary").tooltip("Histórico de Otimizações").props("flat dense")
+                ui.button(icon="hub", on_click=joint_route_dialog,
+                          color="info").tooltip("Roteirização Conjunta (Vários Depósitos)").props("flat dense")
     
                 # Filtro de status
                 status_options = {'all': 'Todos'}
@@ -300,115 +477,160 @@ def planning_list():
                           on_change=handle_filter_change).classes("w-32")
     
         with ui.scroll_area().classes("h-[calc(100vh-250px)] overflow-y-auto"):
-            status_map = {
-                PlanningStatus.pending: ("Pendente", "orange"),
-                PlanningStatus.optimizing: ("Otimizando", "info"),
-                PlanningStatus.ready: ("Pronto", "positive"),
-                PlanningStatus.executed: ("Executado", "green"),
-                PlanningStatus.cancelled: ("Cancelado", "negative"),
-            }
-            if plannings := get_plannings(status_filter=[ui.state.planning_status_filter] if ui.state.planning_status_filter != 'all' else None):
-                for p in plannings:
-                    with ui.card().classes("w-full mb-2"):
-                        with ui.row().classes("w-full justify-between"):
-                            with ui.column().classes("items-end"):
-                                if p.status == PlanningStatus.optimizing:
-                                    # Em otimização, não permite edição, remoção ou adição de pedidos; exibe apenas "Abortar"
-                                    ui.button(
-                                        icon="stop",
-                                        on_click=lambda pl_obj=p: abort_planning(pl_obj),
-                                        color="warning"
-                                    ).tooltip("Abortar Planejamento").props("flat dense")
-                                else:
-                                    # Para status pendente ou pronto, permitir edição, cancelamento, adição de pedidos e roteirizar (se pendente)
-                                    if p.status in [PlanningStatus.pending, PlanningStatus.ready]:
-                                        ui.button(
-                                            icon="edit",
-                                            on_click=lambda pl_obj=p: edit_planning_dialog(pl_obj),
-                                            color="primary"
-                                        ).tooltip("Editar Planejamento").props("flat dense")
-                                        ui.button(
-                                            icon="cancel",
-                                            on_click=lambda pl_obj=p: cancel_planning(pl_obj.id) and refresh(f"Planejamento {pl_obj.id} cancelado!"),
-                                            color="negative"
-                                        ).tooltip("Cancelar Planejamento").props("flat dense")
-                                        ui.button(
-                                            icon="playlist_add",
-                                            on_click=lambda pl_obj=p: select_orders_for_planning_dialog(pl_obj),
-                                            color="primary"
-                                        ).tooltip("Selecionar Pedidos").props("flat dense")
-                                        if p.status == PlanningStatus.pending:
-                                            ui.button(
-                                                icon="directions",
-                                                on_click=lambda pl_obj=p: route_planning(pl_obj),
-                                                color="info"
-                                            ).tooltip("Roteirizar Planejamento").props("flat dense")
-                                        if p.status == PlanningStatus.ready:
-                                            # ui.button(
-                                            #     icon="check_circle",
-                                            #     on_click=lambda pl_obj=p: update_planning(pl_obj.id, status_str="executed") and refresh(f"Planejamento {pl_obj.id} executado!"),
-                                            #     color="positive"
-                                            # ).tooltip("Marcar como Executado").props("flat dense")
-                                            ui.button(
-                                                icon="map",
-                                                on_click=lambda pl_obj=p: show_planning_map(pl_obj.id),
-                                                color="secondary"
-                                            ).tooltip("Ver Mapa do Planejamento").props("flat dense")
-        
-                                    elif p.status == PlanningStatus.cancelled:
-                                        ui.button(
-                                            icon="restore",
-                                            on_click=lambda pl_obj=p: restore_planning(pl_obj.id) and refresh(f"Planejamento {pl_obj.id} restaurado!"),
-                                            color="positive"
-                                        ).tooltip("Restaurar Planejamento").props("flat dense")
-    
-                            with ui.column().classes("gap-0"):
-                                ui.label(f"Depósito: {p.depot.name if p.depot else 'N/A'}").classes("font-semibold text-base")
-                                with ui.row().classes("text-sm text-gray-600 items-center gap-2"):
-                                    ui.label(f"ID: {p.id}")
-                                    ui.separator().props("vertical")
-                                    ui.label(f"Status: {p.status.value.capitalize()}")
-                                    if p.status == PlanningStatus.optimizing:
-                                        # Spinner pequeno indicando que está sendo processado
-                                        ui.spinner(size="0.8rem").classes("ml-1")
-                                    ui.separator().props("vertical")
-                                    ui.label(f"Deadline: {p.deadline.strftime('%d/%m/%Y %H:%M') if p.deadline else 'Não definida'}")
-                                with ui.row().classes("w-full"):
-                                    ui.label(f"Criado em: {p.created_at.strftime('%d/%m/%Y %H:%M') if p.created_at else 'N/A'}").classes("text-xs text-gray-500 mt-1")
-                                    status_text, status_color = status_map.get(p.status, ("Desconhecido", "grey"))
-                                    ui.space().props("vertical")
-                                    ui.badge(status_text, color=status_color)
-                                if hasattr(p, "orders") and p.orders:
-                                    ui.label("Pedidos associados:").classes("mt-2 text-sm")
-                                    for order in p.orders:
-                                        with ui.row().classes("items-center gap-2"):
-                                            ui.label(f"ID: {order.id} - Cliente: {order.customer.name} - Demanda: {order.demand}").classes("text-xs")
-                                            # Exibe o botão de remoção somente se o planejamento não estiver em otimização
-                                            if p.status != PlanningStatus.optimizing:
-                                                ui.button(
-                                                    icon="delete", 
-                                                    on_click=lambda o=order, p_id=p.id: remove_order_from_planning(o.id) and refresh(f"Pedido {o.id} removido do Planejamento {p_id}"),
-                                                    color="negative"
-                                                ).tooltip("Remover Pedido").props("flat dense")
-            else:
-                ui.label("Nenhum planejamento encontrado.")
+            _planning_cards = ui.column().classes("w-full gap-0")
+            _next_after = None
+            _load_more_button = ui.button("Carregar mais", on_click=lambda: load_more_plannings(),
+                                          icon="expand_more").props("flat").classes("w-full")
+            if not load_more_plannings():
+                with _planning_cards:
+                    ui.label("Nenhum planejamento encontrado.")
+
+def load_more_plannings() -> int:
+    """Carrega a próxima página de planejamentos no final da lista. Retorna quantos foram carregados."""
+    global _next_after
+    status_filter = [ui.state.planning_status_filter] if ui.state.planning_status_filter != 'all' else None
+    plannings, _next_after = get_plannings_page(status_filter=status_filter, after=_next_after)
+    with _planning_cards:
+        for p in plannings:
+            planning_card(p)
+    _load_more_button.set_visibility(_next_after is not None)
+    return len(plannings)
+
+def planning_card(p):
+    with ui.card().classes("w-full mb-2"):
+        with ui.row().classes("w-full justify-between"):
+            with ui.column().classes("items-end"):
+                if p.status == PlanningStatus.optimizing:
+                    # Em otimização, não permite edição, remoção ou adição de pedidos; exibe apenas "Abortar"
+                    ui.button(
+                        icon="stop",
+                        on_click=lambda pl_obj=p: abort_planning(pl_obj),
+                        color="warning"
+                    ).tooltip("Abortar Planejamento").props("flat dense")
+                    ui.button(
+                        icon="check_circle",
+                        on_click=lambda pl_obj=p: stop_planning(pl_obj),
+                        color="positive"
+                    ).tooltip("Parar e Manter a Melhor Solução").props("flat dense")
+                else:
+                    # Para status pendente ou pronto, permitir edição, cancelamento, adição de pedidos e roteirizar (se pendente)
+                    if p.status in [PlanningStatus.pending, PlanningStatus.ready]:
+                        ui.button(
+                            icon="edit",
+                            on_click=lambda pl_obj=p: edit_planning_dialog(get_planning_by_id(pl_obj.id, for_selection=True)),
+                            color="primary"
+                        ).tooltip("Editar Planejamento").props("flat dense")
+                        ui.button(
+                            icon="cancel",
+                            on_click=lambda pl_obj=p: cancel_planning(pl_obj.id) and refresh(f"Planejamento {pl_obj.id} cancelado!"),
+                            color="negative"
+                        ).tooltip("Cancelar Planejamento").props("flat dense")
+                        ui.button(
+                            icon="playlist_add",
+                            on_click=lambda pl_obj=p: select_orders_for_planning_dialog(pl_obj),
+                            color="primary"
+                        ).tooltip("Selecionar Pedidos").props("flat dense")
+                        if p.status == PlanningStatus.pending:
+                            ui.button(
+                                icon="directions",
+                                on_click=lambda pl_obj=p: route_planning(pl_obj),
+                                color="info"
+                            ).tooltip("Roteirizar Planejamento").props("flat dense")
+                            ui.button(
+                                icon="bolt",
+                                on_click=lambda pl_obj=p: quick_route_planning(pl_obj),
+                                color="info"
+                            ).tooltip("Roteirização Rápida (Heurística)").props("flat dense")
+                        if p.status == PlanningStatus.ready:
+                            ui.button(
+                                icon="autorenew",
+                                on_click=lambda pl_obj=p: route_planning(pl_obj),
+                                color="info"
+                            ).tooltip("Re-roteirizar Planejamento").props("flat dense")
+                            # ui.button(
+                            #     icon="check_circle",
+                            #     on_click=lambda pl_obj=p: update_planning(pl_obj.id, status_str="executed") and refresh(f"Planejamento {pl_obj.id} executado!"),
+                            #     color="positive"
+                            # ).tooltip("Marcar como Executado").props("flat dense")
+                            ui.button(
+                                icon="map",
+                                on_click=lambda pl_obj=p: show_planning_map(pl_obj.id),
+                                color="secondary"
+                            ).tooltip("Ver Mapa do Planejamento").props("flat dense")
+                            ui.button(
+                                icon="query_stats",
+                                on_click=lambda pl_obj=p: optimization_runs_dialog(pl_obj.id),
+                                color="secondary"
+                            ).tooltip("Otimizações do Planejamento").props("flat dense")
+
+                    elif p.status == PlanningStatus.cancelled:
+                        ui.button(
+                            icon="restore",
+                            on_click=lambda pl_obj=p: restore_planning(pl_obj.id) and refresh(f"Planejamento {pl_obj.id} restaurado!"),
+                            color="positive"
+                        ).tooltip("Restaurar Planejamento").props("flat dense")
+
+            with ui.column().classes("gap-0"):
+                ui.label(f"Depósito: {p.depot_name or 'N/A'}").classes("font-semibold text-base")
+                with ui.row().classes("text-sm text-gray-600 items-center gap-2"):
+                    ui.label(f"ID: {p.id}")
+                    ui.separator().props("vertical")
+                    ui.label(f"Status: {p.status.value.capitalize()}")
+                    if p.status == PlanningStatus.optimizing:
+                        # Spinner pequeno indicando que está sendo processado
+                        ui.spinner(size="0.8rem").classes("ml-1")
+                    ui.separator().props("vertical")
+                    ui.label(f"Deadline: {to_local_time(p.deadline).strftime('%d/%m/%Y %H:%M') if p.deadline else 'Não definida'}")
+                if p.status == PlanningStatus.optimizing:
+                    # Progresso do solver, atualizado pelo timer da página
+                    _progress_labels[p.id] = ui.label(progress_text(p.id)).classes("text-xs text-info")
+                with ui.row().classes("w-full"):
+                    ui.label(f"Criado em: {p.created_at.strftime('%d/%m/%Y %H:%M') if p.created_at else 'N/A'}").classes("text-xs text-gray-500 mt-1")
+                    status_text, status_color = STATUS_BADGES.get(p.status, ("Desconhecido", "grey"))
+                    ui.space().props("vertical")
+                    ui.badge(status_text, color=status_color)
+                summary = p.summary
+                with ui.row().classes("text-xs text-gray-600 items-center gap-2"):
+                    ui.label(f"Pedidos: {summary.order_count}")
+                    ui.separator().props("vertical")
+                    ui.label(f"Demanda: {summary.total_demand}")
+                    if summary.route_count:
+                        ui.separator().props("vertical")
+                        ui.label(f"Rotas: {summary.route_count}")
+                        ui.separator().props("vertical")
+                        ui.label(f"Distância: {summary.total_distance / 1000:.1f} km")
+                if summary.order_count:
+                    # Os pedidos só são consultados quando a expansão é aberta pela primeira vez
+                    with ui.expansion(f"Pedidos associados ({summary.order_count})").classes("w-full text-sm") as expansion:
+                        orders_column = ui.column().classes("gap-0")
+                    expansion.on_value_change(lambda e, p=p, column=orders_column: e.value and planning_orders(p, column))
+
+def planning_orders(p, column):
+    """Preenche a expansão do planejamento com os seus pedidos (apenas na primeira abertura)."""
+    if column.default_slot.children:
+        return
+    with column:
+        for order in get_planning_order_rows([p.id]):
+            with ui.row().classes("items-center gap-2"):
+                ui.label(f"ID: {order.id} - Cliente: {order.customer_name} - Demanda: {order.demand}").classes("text-xs")
+                # Exibe o botão de remoção somente se o planejamento não estiver em otimização
+                if p.status != PlanningStatus.optimizing:
+                    ui.button(
+                        icon="delete", 
+                        on_click=lambda o=order, p_id=p.id: remove_order_from_planning(o.id) and refresh(f"Pedido {o.id} removido do Planejamento {p_id}"),
+                        color="negative"
+                    ).tooltip("Remover Pedido").props("flat dense")
 
 def planning_map():
     global _planning_map
-    plannings = get_plannings()
+    # Apenas os resumos agregados: depósito e retângulo envolvente dos pedidos de cada planejamento
+    plannings = get_planning_rows()
     
-    # Coleta coordenadas dos depósitos e dos pedidos
-    depot_coords = [(p.depot.latitude, p.depot.longitude) for p in plannings 
-                    if p.depot and p.depot.latitude and p.depot.longitude]
-                    
-    orders_coords = []
-    for p in plannings:
-        if hasattr(p, 'orders') and p.orders:
-            for order in p.orders:
-                if order.customer and getattr(order.customer, 'latitude', None) and getattr(order.customer, 'longitude', None):
-                    orders_coords.append((order.customer.latitude, order.customer.longitude))
+    # Coleta coordenadas dos depósitos e dos cantos dos retângulos dos pedidos
+    all_coords = [(p.depot_latitude, p.depot_longitude) for p in plannings
+                  if p.depot_latitude and p.depot_longitude]
+    all_coords += [tuple(corner) for p in plannings if p.summary.bbox for corner in p.summary.bbox]
     
-    all_coords = depot_coords + orders_coords
     if all_coords:
         lats = [c[0] for c in all_coords]
         lons = [c[1] for c in all_coords]
@@ -421,33 +643,27 @@ def planning_map():
     
     # Marcadores dos depósitos
     for p in plannings:
-        if p.depot and p.depot.latitude and p.depot.longitude:
+        if p.depot_latitude and p.depot_longitude:
             folium.Marker(
-                location=[p.depot.latitude, p.depot.longitude],
-                popup=f"Planejamento {p.id}<br>Depósito: {p.depot.name}",
+                location=[p.depot_latitude, p.depot_longitude],
+                popup=f"Planejamento {p.id}<br>Depósito: {p.depot_name}",
                 icon=folium.Icon(color="blue", icon="warehouse", prefix='fa')
             ).add_to(m)
     
-    # Marcadores dos pedidos (em vermelho) e linhas conectando ao depósito
+    # Área atendida por cada planejamento (retângulo envolvente dos pedidos), com o resumo
     for p in plannings:
-        if hasattr(p, 'orders') and p.orders and p.depot and p.depot.latitude and p.depot.longitude:
-            for order in p.orders:
-                if order.customer and getattr(order.customer, 'latitude', None) and getattr(order.customer, 'longitude', None):
-                    folium.Marker(
-                        location=[order.customer.latitude, order.customer.longitude],
-                        popup=f"Pedido {order.id}<br>Cliente: {order.customer.name}",
-                        icon=folium.Icon(color="red", icon="shopping-cart")
-                    ).add_to(m)
-                    # Linha ligando o depósito ao pedido
-                    folium.PolyLine(
-                        locations=[
-                            [p.depot.latitude, p.depot.longitude],
-                            [order.customer.latitude, order.customer.longitude]
-                        ],
-                        color="black",
-                        weight=2,
-                        dash_array="5, 5"
-                    ).add_to(m)
+        summary = p.summary
+        if summary.bbox:
+            folium.Rectangle(
+                bounds=summary.bbox,
+                popup=(f"Planejamento {p.id}<br>Pedidos: {summary.order_count}<br>Demanda: {summary.total_demand}"
+                       f"<br>Rotas: {summary.route_count}<br>Distância: {summary.total_distance / 1000:.1f} km"),
+                color="red",
+                weight=2,
+                dash_array="5, 5",
+                fill=True,
+                fill_opacity=0.05
+            ).add_to(m)
     
     _planning_map.clear()
     with _planning_map:
@@ -462,6 +678,20 @@ def planning_page(container):
         _planning_map = ui.column().classes("w-3/5 h-full p-4")
         planning_map()
 
+        # Atualiza o progresso das otimizações em segundo plano e a página quando uma termina
+        last_version = optimization_queue.version
+
+        def check_optimizations():
+            nonlocal last_version
+            if optimization_queue.version != last_version:
+                last_version = optimization_queue.version
+                refresh("Otimização concluída.")
+                return
+            for planning_id, label in _progress_labels.items():
+                label.set_text(progress_text(planning_id))
+
+        ui.timer(1.0, check_optimizations)
+
 def refresh(msg: str = "", color: str = "positive"):
     planning_list()
     planning_map()
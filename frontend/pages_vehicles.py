@@ -2,7 +2,7 @@
 Gerenciamento de veículos: cadastro, edição, ativar/desativar, lista.
 """
 from nicegui import ui
-from backend.controler import get_vehicles, get_depots, add_vehicle, update_vehicle, toggle_vehicle_active
+from backend.controler import get_vehicle_rows, get_depots, add_vehicle, update_vehicle, toggle_vehicle_active
 
 ui.state.show_disabled_vehicles = False
 
@@ -94,8 +94,7 @@ def vehicle_list():
                             value=ui.state.show_disabled_vehicles,
                             on_change=lambda e: toggle_show_disabled(e.value))
         with ui.column().classes("w-2/3"), ui.scroll_area().classes("border h-[500px]"):
-            # vehicles = get_vehicles()
-            if vehicles:= get_vehicles():
+            if vehicles:= get_vehicle_rows():
                 for v in vehicles:
                     # Card para cada veículo
                     with ui.card().classes('w-full max-w-2xl mb-4 mx-auto') as vehicle_card: # Adicionada mx-auto para centralizar
@@ -110,7 +109,7 @@ def vehicle_list():
                         ui.label(f"Modelo: {v.model}")
                         ui.label(f"Capacidade: {v.capacity} unidades")
                         ui.label(f"Custo por km: R$ {v.cost_per_km:.2f}")
-                        ui.label(f"Depósito: {v.depot.name if v.depot else 'N/A'}")
+                        ui.label(f"Depósito: {v.depot_name or 'N/A'}")
                         ui.label(f"ID: {v.id}").classes("text-xs text-gray-500")
 
                         with ui.card_actions().classes("w-full justify-end"):